@@ -1,4 +1,8 @@
+import asyncio
 import os
+import threading
+import time
+import weakref
 import click
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
@@ -9,7 +13,7 @@ from inventree.part import Parameter as InvParameter
 from inventree.part import Part, PartCategory, ParameterTemplate
 from inventree.stock import StockLocation
 
-from backend.utilities import Tools
+from backend.utilities import Symbology, Tools
 from backend.tree_utilities import select_from_tree
 
 # Define valid part parameters
@@ -37,11 +41,18 @@ NORMALIZED_PARAM_NAMES = {name.lower().replace(" ", ""): name
 
 CLR = "cls" if os.name == "nt" else "clear"
 
+# Part fields a supplier lookup fills in after a part was created from label data
+ENRICHED_FIELDS = ("name", "description", "link", "remote_image", "keywords")
+
+LOOKUP_CACHE_TTL = 300  # Seconds a response fetched by parseCode waits for the matching query
+LOOKUP_CACHE_SIZE = 64  # Maximum number of responses kept by a LookupCache
+
 @dataclass
 class Parameter:
     name: str                       # The name of the parameter
     value_str: str = None           # The original string representation of the parameter value as scraped from the supplier
     value: tuple[str, str] = None   # Parsed representation of the value as a (numeric_value, unit) tuple
+    options: list[str] = None       # All values parsed from value_str if it held more than one, until choose() picks one
 
     def __post_init__(self):
         utils = Tools()
@@ -74,25 +85,33 @@ class Parameter:
             values = list(ret.values())
 
             if len(values) > 1:
-                click.echo( "Multiple possible parameter values were found for " + click.style(self.name, bold=True, fg="yellow"))
-                for idx, valstr in enumerate(values):
-                    click.secho(f"{idx}. {valstr}", bold=False)
-                
-                choice = click.prompt(
-                    f"Select correct [value][unit] option (0-{len(values)-1})",
-                    type=click.IntRange(0, len(values)-1),
-                    show_choices=False
-                )
-                selected = values[choice]
-            else:
-                # only one choice, pick it
-                selected = values[0]
+                # Parameters are parsed in background lookups, so the user is asked later by choose()
+                self.options = values
 
-            val, unit = utils.splitUnits(selected)
+            # The first value until the user picks another one
+            val, unit = utils.splitUnits(values[0])
 
             if (val, unit) != None:
                 self.value = (val, unit)
 
+    def choose(self):
+        """Ask which value is the right one if more than one was parsed, call it on the main thread."""
+        if not self.options:
+            return
+
+        click.echo( "Multiple possible parameter values were found for " + click.style(self.name, bold=True, fg="yellow"))
+        for idx, valstr in enumerate(self.options):
+            click.secho(f"{idx}. {valstr}", bold=False)
+
+        choice = click.prompt(
+            f"Select correct [value][unit] option (0-{len(self.options)-1})",
+            type=click.IntRange(0, len(self.options)-1),
+            show_choices=False
+        )
+        val, unit = Tools().splitUnits(self.options[choice])
+        self.value = (val, unit)
+        self.options = None
+
 @dataclass
 class PartData:
     name: str                       # Display name of the part
@@ -112,6 +131,48 @@ class PartData:
     part_pk: int = None             # Existing part template key
     is_template: bool = False       # Flag marking this data as a template
 
+    @classmethod
+    def from_label(cls, supplier_pn: str, manufacturer_pn: str, part_count: int = None) -> 'PartData':
+        """Partial part data read from a supplier label, the rest is filled in by a supplier lookup."""
+        return cls(
+            name = manufacturer_pn or supplier_pn,
+            supplier_pn = supplier_pn,
+            manufacturer_pn = manufacturer_pn,
+            description = "",
+            remote_image = None,
+            link = None,
+            unit_price = None,
+            minimum_stock = None,
+            part_count = part_count,
+            note = None,
+            parameters = [],
+            keywords = ", ".join(pn for pn in (supplier_pn, manufacturer_pn) if pn)
+        )
+
+    def choose_parameters(self):
+        """Let the user pick the value of every parameter that parsed to more than one."""
+        for parameter in self.parameters or []:
+            parameter.choose()
+
+    def fill_in(self, api: InvenTreeAPI, part_pk: int, label: 'PartData', part_data: 'PartData'):
+        """
+        Update a part created from label data with the data of the finished
+        supplier lookup. Only fields still holding the label's value are
+        replaced, edits made before the part was created are kept.
+        """
+        updates = {}
+        for attr in ENRICHED_FIELDS:
+            if getattr(self, attr) == getattr(label, attr) and getattr(part_data, attr):
+                setattr(self, attr, getattr(part_data, attr))
+                updates[attr] = getattr(part_data, attr)
+
+        part = Part(api, part_pk)
+        if updates:
+            part.save(data=updates)
+        if not self.parameters and part_data.parameters:
+            self.parameters = part_data.parameters
+            self.add_parameters(api, part)
+
     def create(self, api, template_pk = None):
         """
         Create a new part or template in the InvenTree system.
@@ -536,9 +597,48 @@ class PartData:
             click.secho("Invalid selection!", fg='red')
             click.pause()
 
+class LookupCache:
+    """
+    Hands API responses fetched while validating a code in parseCode over to
+    the following query of the same part number, so a lookup doesn't fetch
+    the same product twice. An entry is removed once query picks it up.
+    """
+
+    def __init__(self, ttl: float = LOOKUP_CACHE_TTL, max_size: int = LOOKUP_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}      # part number -> (response, time stored)
+        self._lock = threading.Lock()
+
+    def put(self, part_number: str, response):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Drop the oldest entry
+                del self._entries[next(iter(self._entries))]
+            self._entries[part_number] = (response, time.monotonic())
+
+    def pop(self, part_number: str):
+        with self._lock:
+            entry = self._entries.pop(part_number, None)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            return None
+        return entry[0]
+
 class baseSupplier(ABC):
     """Abstract base class for supplier integrations"""
 
+    # Symbologies used on the supplier's labels, the scanner only runs these decoders
+    symbologies = frozenset(Symbology)
+
+    # Whether query() may run in a background thread
+    thread_safe = True
+
+    # Whether query() has to fetch part parameters, suppliers may skip that work when False
+    use_parameters = True
+
+    # Lookups allowed in flight at once through aquery/aquery_many
+    max_concurrency = 4
+
     @abstractmethod
     def __init__(self,  utils: Tools, config):
         pass
@@ -565,6 +665,74 @@ class baseSupplier(ABC):
         """
         pass
 
+    @classmethod
+    def configured(cls, config) -> bool:
+        """Whether the config holds everything the supplier needs (e.g. API credentials)"""
+        return True
+
+    def recognizes(self, code: str) -> bool:
+        """Cheap, network-free check whether a scanned code is one of the supplier's labels"""
+        return False
+
+    def labelData(self, code: str) -> PartData:
+        """
+        Partial part data (part numbers, quantity) printed on the label the
+        code was read from, None if it didn't come from a supplier label.
+        """
+        return None
+
+    def supplierNames(self, code: str) -> list[str]:
+        """
+        Names of the suppliers that may answer a query of the code, the one
+        that did first once it's known. Cached parts are kept apart by them.
+        """
+        return [type(self).__name__]
+
+    def cacheKey(self, code: str) -> str:
+        """
+        Part number a query of the code is cached under. Suppliers whose query
+        takes whole label payloads reduce them to the part number, so bags of
+        the same part with a different quantity or lot share one entry.
+        """
+        return code
+
+    async def aquery(self, partNumber) -> PartData:
+        """
+        Asynchronous query(). Runs the blocking lookup in a worker thread, at
+        most max_concurrency lookups of this supplier run at the same time.
+        """
+        async with self.limiter():
+            return await asyncio.to_thread(self.query, partNumber)
+
+    async def aquery_many(self, partNumbers: list[str]) -> list[PartData]:
+        """
+        Look up all part numbers concurrently, returns a PartData (None if not
+        found) for each, in order. A failed lookup gives its exception instead.
+        """
+        return await asyncio.gather(*(self.aquery(pn) for pn in partNumbers), return_exceptions=True)
+
+    def lookupBatches(self, partNumbers: list[str]) -> list[list[str]]:
+        """
+        Group part numbers into the batches one aquery_many call should look up
+        together. Only suppliers with real batch API calls group them, every
+        other part number is a batch of its own so its result isn't held back
+        by the slower lookups of others.
+        """
+        return [[pn] for pn in partNumbers]
+
+    def limiter(self) -> asyncio.Semaphore:
+        """Semaphore limiting this supplier's lookups in flight on the running event loop"""
+        if "_limiters" not in self.__dict__:
+            self._limiters = weakref.WeakKeyDictionary()
+        loop = asyncio.get_running_loop()
+        if loop not in self._limiters:
+            self._limiters[loop] = asyncio.Semaphore(self.max_concurrency if self.thread_safe else 1)
+        return self._limiters[loop]
+
+    def close(self):
+        """Release network sessions and other resources held by the supplier"""
+        pass
+
     @abstractmethod
     def _mapParameters(self, supplier_params) -> list[Parameter]:
         """
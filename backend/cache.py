@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+
+import click
+
+from backend.base import Parameter, PartData, baseSupplier
+from backend.file import fileHandler
+
+CACHE_FILE = "supplier_cache.sqlite"
+STATIC_TTL = 30         # Days the description, parameters, image etc. are reused
+PRICE_TTL = 1           # Days the unit price is reused
+CACHE_MAX_ENTRIES = 5000
+
+# PartData fields that describe the stocked item rather than the supplier's product
+LOCAL_FIELDS = ("minimum_stock", "part_count", "note", "category_pk", "location_pk", "part_pk", "is_template")
+
+class SupplierCache:
+    """
+    On-disk SQLite cache of normalized supplier lookups keyed by (supplier, part number).
+    Static part data and the volatile unit price have separate TTLs, the least
+    recently used entries are evicted once the cache holds more than max_entries.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, static_ttl: float = STATIC_TTL, price_ttl: float = PRICE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.static_ttl = static_ttl * 86400
+        self.price_ttl = price_ttl * 86400
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS parts (
+                supplier TEXT NOT NULL,
+                part_number TEXT NOT NULL,
+                data TEXT NOT NULL,         -- PartData as JSON
+                fetched REAL NOT NULL,      -- When the part data was fetched
+                priced REAL NOT NULL,       -- When the unit price was fetched
+                used REAL NOT NULL,         -- Last cache hit, for LRU eviction
+                PRIMARY KEY (supplier, part_number)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS parts_used ON parts (used)")
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config: str) -> 'SupplierCache':
+        settings = fileHandler(config).readCredentials().get("cache", {})
+        return cls(
+            path = settings.get("path", CACHE_FILE),
+            static_ttl = settings.get("static-ttl", STATIC_TTL),
+            price_ttl = settings.get("price-ttl", PRICE_TTL),
+            max_entries = settings.get("max-entries", CACHE_MAX_ENTRIES),
+        )
+
+    def get(self, supplier: str, part_number: str) -> tuple[PartData, bool]:
+        """
+        Return (part_data, price_is_fresh) for a cached part, (None, False) if
+        it isn't cached or its static data expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, fetched, priced FROM parts WHERE supplier = ? AND part_number = ?",
+                (supplier, part_number)
+            ).fetchone()
+            if row is None or now - row[1] >= self.static_ttl:
+                return None, False
+            self._db.execute("UPDATE parts SET used = ? WHERE supplier = ? AND part_number = ?", (now, supplier, part_number))
+            self._db.commit()
+
+        return self.__decode(row[0]), now - row[2] < self.price_ttl
+
+    def put(self, supplier: str, part_number: str, part_data: PartData):
+        data = asdict(part_data)
+        for name in LOCAL_FIELDS:
+            data.pop(name, None)
+        encoded = json.dumps(data)
+
+        now = time.time()
+        with self._lock:
+            # Store under the supplier part number too, so typing it finds a scanned part
+            for key in {part_number, part_data.supplier_pn}:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO parts (supplier, part_number, data, fetched, priced, used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (supplier, key, encoded, now, now, now)
+                )
+            self.__evict()
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM parts WHERE rowid IN (SELECT rowid FROM parts ORDER BY used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def __decode(self, encoded: str) -> PartData:
+        data = json.loads(encoded)
+        if data["parameters"] is not None:
+            data["parameters"] = [
+                Parameter(name=p["name"], value_str=p["value_str"], value=tuple(p["value"]) if p["value"] else None,
+                          options=p.get("options"))
+                for p in data["parameters"]
+            ]
+        return PartData(minimum_stock=None, part_count=None, note=None, **data)
+
+class CachedSupplier:
+    """
+    Wraps a supplier so query() is answered from a SupplierCache when possible.
+    A part whose price expired is looked up again, if that fails the cached data
+    is used with the old price. With bypass the cache is only written, never read.
+    All other attributes are passed through to the wrapped supplier.
+    """
+
+    def __init__(self, supplier: baseSupplier, cache: SupplierCache, bypass: bool = False):
+        self.supplier = supplier
+        self.cache = cache
+        self.bypass = bypass
+        if hasattr(supplier, "query_many"):
+            self.query_many = self._query_many
+
+    def __getattr__(self, name):
+        return getattr(self.supplier, name)
+
+    def query(self, part_number) -> PartData:
+        cached, price_fresh = self.__lookup(part_number)
+        if cached is not None and price_fresh:
+            return cached
+
+        part_data = self.supplier.query(part_number)
+        return self.__store(part_number, part_data, cached)
+
+    def _query_many(self, part_numbers: list[str]) -> list[PartData]:
+        lookups = {part_number: self.__lookup(part_number) for part_number in part_numbers}
+        missing = [part_number for part_number, (cached, fresh) in lookups.items() if cached is None or not fresh]
+
+        fetched = dict(zip(missing, self.supplier.query_many(missing))) if missing else {}
+        for part_number in missing:
+            fetched[part_number] = self.__store(part_number, fetched[part_number], lookups[part_number][0])
+
+        return [fetched.get(part_number) or lookups[part_number][0] for part_number in part_numbers]
+
+    async def aquery(self, part_number) -> PartData:
+        cached, price_fresh = self.__lookup(part_number)
+        if cached is not None and price_fresh:
+            return cached
+
+        part_data = await self.supplier.aquery(part_number)
+        return self.__store(part_number, part_data, cached)
+
+    async def aquery_many(self, part_numbers: list[str]) -> list[PartData]:
+        lookups = {part_number: self.__lookup(part_number) for part_number in part_numbers}
+        missing = [part_number for part_number, (cached, fresh) in lookups.items() if cached is None or not fresh]
+
+        fetched = dict(zip(missing, await self.supplier.aquery_many(missing))) if missing else {}
+        for part_number in missing:
+            part_data, cached = fetched[part_number], lookups[part_number][0]
+            if isinstance(part_data, BaseException):
+                # Keep the failure unless there's cached data to fall back to
+                fetched[part_number] = self.__store(part_number, None, cached) if cached is not None else part_data
+            else:
+                fetched[part_number] = self.__store(part_number, part_data, cached)
+
+        return [fetched.get(part_number) or lookups[part_number][0] for part_number in part_numbers]
+
+    def close(self):
+        self.supplier.close()
+        self.cache.close()
+
+    def __lookup(self, part_number: str) -> tuple[PartData, bool]:
+        if self.bypass:
+            return None, False
+        # Any of the suppliers that may answer, Auto mode doesn't know which one it is before the query
+        key = self.supplier.cacheKey(part_number)
+        for name in self.supplier.supplierNames(part_number):
+            cached, price_fresh = self.cache.get(name, key)
+            if cached is not None:
+                return cached, price_fresh
+        return None, False
+
+    def __store(self, part_number: str, part_data: PartData, cached: PartData) -> PartData:
+        if part_data is None:
+            if cached is not None:
+                click.secho("Supplier lookup failed, using cached data with an outdated price.", fg="yellow")
+            return cached
+
+        # A lookup that skipped the parameters would hide them from a later session that wants them
+        if part_data.parameters or self.supplier.use_parameters:
+            # Stored under the supplier that answered
+            self.cache.put(self.supplier.supplierNames(part_number)[0], self.supplier.cacheKey(part_number), part_data)
+        return part_data
@@ -11,10 +11,43 @@ token = "token" # token placeholder
 [digikey] # https://developer.digikey.com
 client-id = "" # production app client id 
 client-secret = "" # production app client secret key
+token-file = "digikey_token.json" # OAuth token kept across restarts, written automatically
 
 [tme] # https://developers.tme.eu/
 app-secret = "" # production app secret
-client-token = "" # client private key"""
+client-token = "" # client private key
+
+[cache] # local cache of supplier lookups
+path = "supplier_cache.sqlite" # SQLite database file
+static-ttl = 30 # days part descriptions, parameters and images are reused
+price-ttl = 1 # days prices are reused
+max-entries = 5000 # least recently used parts are removed above this count
+bypass = false # always query the supplier (results are still stored)
+
+[endpoints] # supplier base URLs, point them at benchmarks/stub_server.py to test offline
+digikey = "https://api.digikey.com"
+tme = "https://api.tme.eu"
+lcsc = "https://www.lcsc.com"
+lcsc-api = "https://wmsc.lcsc.com"
+
+[fixtures] # recorded supplier responses
+mode = "off" # off, record (save every response) or replay (answer from the recordings, no network)
+path = "fixtures"
+
+[rate-limits] # supplier API requests, 0 for no limit
+quota-file = "api_quota.json" # requests sent today, kept across restarts
+
+[rate-limits.digikey]
+per-minute = 120
+per-day = 1000
+
+[rate-limits.tme]
+per-minute = 300
+per-day = 0
+
+[rate-limits.lcsc]
+per-minute = 60
+per-day = 0"""
         self.check_file()
 
     def check_file(self):
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from backend.base import PartData, baseSupplier
+
+class LookupRunner:
+    """
+    Runs supplier lookups on an asyncio event loop in a background thread.
+    Any number of lookups can be submitted, the supplier's aquery/aquery_many
+    keep at most max_concurrency of them in flight. Every lookup is returned
+    as a concurrent.futures.Future, so callers don't need to be async.
+    """
+
+    def __init__(self, supplier: baseSupplier):
+        self.supplier = supplier
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="lookups")
+        self._thread.start()
+
+    def submit(self, part_number: str) -> Future:
+        return asyncio.run_coroutine_threadsafe(self.supplier.aquery(part_number), self.loop)
+
+    def submit_many(self, part_numbers: list[str]) -> list[Future]:
+        """
+        Look up all part numbers, returns a future per part number. Every batch
+        of the supplier's lookupBatches is a separate aquery_many call, so a
+        part's future resolves as soon as its own batch is done.
+        """
+        lookups = {}
+        for batch in self.supplier.lookupBatches(part_numbers):
+            futures = [Future() for _ in batch]
+            for part_number, lookup in zip(batch, futures):
+                lookups.setdefault(part_number, []).append(lookup)
+            call = asyncio.run_coroutine_threadsafe(self.supplier.aquery_many(batch), self.loop)
+            call.add_done_callback(lambda call, futures=futures: self.__resolve(call, futures))
+        return [lookups[part_number].pop(0) for part_number in part_numbers]
+
+    def run(self, part_numbers: list[str]) -> list[PartData]:
+        """Blocking lookup of all part numbers, for batch imports."""
+        return [lookup.result() for lookup in self.submit_many(part_numbers)]
+
+    def close(self):
+        # Lookups still in flight are abandoned, their worker threads finish in the background
+        self.loop.call_soon_threadsafe(self.__cancel)
+        self._thread.join(timeout=5)
+
+    @staticmethod
+    def __resolve(call: Future, futures: list[Future]):
+        try:
+            results = call.result()
+        except BaseException as e:
+            for lookup in futures:
+                lookup.set_exception(e)
+            return
+        # Every part number succeeds or fails on its own
+        for lookup, part_data in zip(futures, results):
+            if isinstance(part_data, BaseException):
+                lookup.set_exception(part_data)
+            else:
+                lookup.set_result(part_data)
+
+    def __cancel(self):
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+        self.loop.stop()
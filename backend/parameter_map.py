@@ -0,0 +1,73 @@
+from backend.base import VALID_PART_PARAMETERS, Parameter
+
+def normalize_name(name) -> str:
+    return str(name).lower().replace(" ", "")
+
+class ParameterMap:
+    """
+    Maps a supplier's part parameters to the VALID_PART_PARAMETERS names.
+    The table lists the supplier's parameter IDs (or names) for every
+    parameter, in order of preference, as suppliers aren't always consistent
+    with them. It's validated and compiled once into an index of every
+    supplier ID, mapping a response is a single pass over its parameters.
+    """
+
+    def __init__(self, table: dict[str, list], key: str, value: str, by_name: bool = False):
+        self.key = key              # Field of a supplier parameter holding its ID or name
+        self.value = value          # Field of a supplier parameter holding its value
+        self.by_name = by_name      # Match names ignoring case and spaces instead of exact IDs
+        for name in table:
+            if name not in VALID_PART_PARAMETERS:
+                raise ValueError(f"Invalid parameter ({name})!")
+        # (parameter name, supplier IDs most preferred first) in table order
+        self.table = tuple((name, tuple(self.__key(supplier_id) for supplier_id in ids)) for name, ids in table.items())
+        # supplier ID -> (parameter name, preference rank), 0 is the most preferred
+        self.index = {}
+        for name, ids in self.table:
+            for rank, supplier_id in enumerate(ids):
+                if supplier_id in self.index:
+                    raise ValueError(f"Parameter ID {supplier_id} is mapped twice!")
+                self.index[supplier_id] = (name, rank)
+
+    def resolve(self, supplier_params) -> list[tuple[str, list[str]]]:
+        """
+        Find the mapped parameters of a response: (name, values) in table
+        order, the values most preferred first.
+        """
+        lookup, key, value_key = self.index.get, self.key, self.value
+        if self.by_name:
+            hits = [(entry, param) for param in supplier_params if (entry := lookup(normalize_name(param.get(key))))]
+        else:
+            hits = [(entry, param) for param in supplier_params if (entry := lookup(param.get(key)))]
+
+        found = {}      # parameter name -> [(rank, value)], a response rarely has more than one per name
+        for (name, rank), param in hits:
+            value = (param.get(value_key) or "").strip()
+            if value != "" and value != "-":
+                if name in found:
+                    found[name].append((rank, value))
+                else:
+                    found[name] = [(rank, value)]
+
+        resolved = []
+        for name, _ in self.table:
+            if (candidates := found.get(name)) is not None:
+                if len(candidates) > 1:
+                    candidates.sort()
+                resolved.append((name, [value for _, value in candidates]))
+        return resolved
+
+    def map(self, supplier_params) -> list[Parameter]:
+        params = []
+        for name, values in self.resolve(supplier_params):
+            # Use the most preferred value that parses, skip the parameter if none does
+            for value in values:
+                try:
+                    params.append(Parameter(name=name, value_str=value))
+                    break
+                except Exception:
+                    continue
+        return params
+
+    def __key(self, supplier_id):
+        return normalize_name(supplier_id) if self.by_name else supplier_id
@@ -0,0 +1,427 @@
+import os
+import queue
+import select
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import click
+import cv2
+
+from backend.utilities import Symbology, Tools
+
+RECONNECT_DELAY = 1.0       # Seconds between camera reconnect attempts
+DATAMATRIX_INTERVAL = 10    # Try DataMatrix every Nth frame if the supplier doesn't use it
+FULL_FRAME_INTERVAL = 15    # Decode the whole frame every Nth frame in case region detection misses a code
+MOTION_THRESHOLD = 6.0      # Mean absolute pixel difference (0-255) that counts as motion
+MOTION_THUMB_SIZE = (80, 45)    # Size of the thumbnails compared by the motion gate
+MOTION_IDLE_INTERVAL = 2.0  # Seconds after which a static scene is decoded anyway
+PAYLOAD_TTL = 10.0          # Seconds a parsed (or rejected) payload is remembered
+OVERLAY_TTL = 0.5           # Seconds a detection stays drawn on the preview
+
+
+def has_display() -> bool:
+    """Check if a GUI window can be opened (e.g. not an SSH session without X forwarding)."""
+    if sys.platform.startswith("linux"):
+        return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return True
+
+
+def enter_pressed() -> bool:
+    """Non-blocking check whether the operator pressed ENTER in the terminal."""
+    if os.name == "nt":
+        import msvcrt
+        return msvcrt.kbhit() and msvcrt.getwch() in ("\r", "\n")
+    ready, _, _ = select.select([sys.stdin], [], [], 0)
+    if ready:
+        sys.stdin.readline()
+        return True
+    return False
+
+
+def draw_overlay(frame, detections):
+    """Return a copy of the frame with a rectangle around each (code, (x, y, w, h)) detection."""
+    frame = frame.copy()
+    for _, (x, y, w, h) in detections:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    return frame
+
+
+@dataclass
+class ScanStats:
+    frames_captured: int = 0                            # Frames read from the camera
+    frames_decoded: int = 0                             # Frames that went through the decoders
+    frames_skipped: int = 0                             # Frames skipped by the motion gate
+    decode_time: float = 0.0                            # Total time spent decoding, in seconds
+    elapsed: float = 0.0                                # Duration of the scan, in seconds
+    latencies: list[float] = field(default_factory=list)  # Capture -> accepted code, in seconds
+
+    @property
+    def duty_cycle(self) -> float:
+        """Fraction of the considered frames that were actually decoded."""
+        considered = self.frames_decoded + self.frames_skipped
+        return self.frames_decoded / considered if considered else 0.0
+
+    @property
+    def decode_load(self) -> float:
+        """Average number of CPU cores kept busy by decoding."""
+        return self.decode_time / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        line = f"Frames captured: {self.frames_captured}, frames decoded: {self.frames_decoded}"
+        line += f", duty cycle: {self.duty_cycle:.0%} ({self.decode_load:.2f} cores)"
+        if self.latencies:
+            avg = sum(self.latencies) / len(self.latencies)
+            line += f", scan latency: {avg * 1000:.0f} ms"
+        return line
+
+
+class MotionGate:
+    """
+    Frame differencing gate for the scan pipeline. A frame is decoded when it
+    differs from the last decoded frame, when the last decode still found a
+    code, or when the scene has been static for MOTION_IDLE_INTERVAL seconds.
+    """
+
+    def __init__(self, threshold: float = MOTION_THRESHOLD, idle_interval: float = MOTION_IDLE_INTERVAL):
+        self.threshold = threshold
+        self.idle_interval = idle_interval
+        self._reference = None
+        self._codes_in_view = False
+        self._last_decode = 0.0
+        self._lock = threading.Lock()
+
+    def should_decode(self, frame) -> bool:
+        thumb = cv2.resize(frame, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        now = time.monotonic()
+
+        with self._lock:
+            # Compare against the last decoded frame so slow changes add up too
+            if (self._reference is None or self._codes_in_view
+                    or now - self._last_decode >= self.idle_interval
+                    or cv2.absdiff(thumb, self._reference).mean() > self.threshold):
+                self._reference = thumb
+                self._last_decode = now
+                return True
+            return False
+
+    def update(self, found: bool):
+        """Report whether the last decoded frame contained any code."""
+        with self._lock:
+            self._codes_in_view = found
+
+    def reset(self):
+        with self._lock:
+            self._reference = None
+            self._codes_in_view = False
+
+
+class FrameDecoder:
+    """
+    Frame decode callable for the scan pipeline. Only the decoders for the
+    supplier's symbologies run on every frame, DataMatrix (the slowest one)
+    is still tried on every Nth frame when the supplier doesn't claim it.
+    Frames are decoded in candidate regions only, with a periodic full frame
+    pass as a fallback for codes the region detection misses.
+    """
+
+    def __init__(self, utils: Tools, symbologies=None,
+                 datamatrix_interval: int = DATAMATRIX_INTERVAL, full_frame_interval: int = FULL_FRAME_INTERVAL):
+        self.utils = utils
+        self.symbologies = frozenset(symbologies) if symbologies is not None else frozenset(Symbology)
+        self.datamatrix_interval = datamatrix_interval
+        self.full_frame_interval = full_frame_interval
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, frame):
+        with self._lock:
+            self._count += 1
+            count = self._count
+
+        symbologies = self.symbologies
+        if Symbology.DATAMATRIX not in symbologies and count % self.datamatrix_interval == 0:
+            symbologies = symbologies | {Symbology.DATAMATRIX}
+
+        use_regions = count % self.full_frame_interval != 0
+        return self.utils.decode_barcodes(frame, symbologies, use_regions=use_regions)
+
+
+class PayloadCache:
+    """
+    Remembers the result of supplier.parseCode for each decoded payload for a
+    short time, so a label that stays in view is parsed (and possibly looked
+    up online) only once. Rejected payloads are remembered as well.
+    """
+
+    def __init__(self, ttl: float = PAYLOAD_TTL):
+        self.ttl = ttl
+        self._entries = {}      # payload -> (parsed code or None, time parsed)
+
+    def parse(self, payload: str, parse_code) -> str | None:
+        now = time.monotonic()
+        entry = self._entries.get(payload)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+
+        code = parse_code(payload)
+        self._purge(now)
+        self._entries[payload] = (code, now)
+        return code
+
+    def _purge(self, now: float):
+        expired = [payload for payload, (_, parsed_at) in self._entries.items() if now - parsed_at >= self.ttl]
+        for payload in expired:
+            del self._entries[payload]
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Reads frames from an opened cv2.VideoCapture in the background and keeps
+    only the newest one, so slow consumers never see a backlog of stale frames.
+    If a reconnect callable is given, a read failure reopens the camera instead
+    of stopping the grabber.
+    """
+
+    def __init__(self, camera, reconnect=None):
+        super().__init__(daemon=True, name="frame-grabber")
+        self.camera = camera
+        self.reconnect = reconnect          # Callable returning a new opened capture or None
+        self.failed = False
+        self.reconnecting = False
+        self.frames_captured = 0
+        self._cond = threading.Condition()
+        self._running = True
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+
+    def run(self):
+        while self._running:
+            ret, frame = self.camera.read()
+            if not ret or frame is None:
+                if self.reconnect is not None and self._reconnect():
+                    continue
+                with self._cond:
+                    self.failed = True
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_time = time.monotonic()
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def _reconnect(self) -> bool:
+        self.reconnecting = True
+        self.camera.release()
+        while self._running:
+            camera = self.reconnect()
+            if camera is not None:
+                self.camera = camera
+                self.reconnecting = False
+                return True
+            time.sleep(RECONNECT_DELAY)
+        return False
+
+    def latest(self) -> tuple[int, float, object]:
+        """Return (frame_id, capture_time, frame) of the newest frame without waiting."""
+        with self._cond:
+            return self._frame_id, self._frame_time, self._frame
+
+    def wait_newer(self, frame_id: int, timeout: float = 0.5) -> tuple[int, float, object]:
+        """Block until a frame newer than frame_id arrives (or timeout) and return it."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id > frame_id or self.failed or not self._running, timeout)
+            if self._frame_id <= frame_id:
+                return frame_id, 0.0, None
+            return self._frame_id, self._frame_time, self._frame
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=2)
+
+
+class ScanPipeline:
+    """
+    Feeds the newest grabbed frame to a pool of decode workers. A frame is only
+    taken once a worker is free, so decoding never queues up behind the camera.
+    Decoded results are collected with poll() from the display loop, the
+    locations of the latest detections are kept for drawing an overlay.
+    Decoding only runs between resume() and pause(), the threads stay alive
+    until stop() so consecutive scans reuse them. An optional MotionGate skips
+    frames of a static scene.
+    """
+
+    def __init__(self, grabber: FrameGrabber, decode, workers: int = 2, gate: MotionGate = None):
+        self.grabber = grabber
+        self.decode = decode                # Callable: frame -> list of (code, (x, y, w, h))
+        self.gate = gate
+        self.stats = ScanStats()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+        self._slots = threading.Semaphore(workers)
+        self._results = queue.Queue()
+        self._detections = ([], 0.0)
+        self._lock = threading.Lock()
+        self._running = False
+        self._active = threading.Event()
+        self._captured_base = 0
+        self._started_at = time.monotonic()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True, name="decode-dispatch")
+
+    def start(self):
+        self._running = True
+        self._active.set()
+        self._dispatcher.start()
+
+    def stop(self):
+        self.pause()
+        self._running = False
+        self._dispatcher.join(timeout=2)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def resume(self):
+        """Start decoding again with fresh statistics."""
+        self.poll()
+        if self.gate is not None:
+            self.gate.reset()
+        with self._lock:
+            self.stats = ScanStats()
+            self._captured_base = self.grabber.frames_captured
+            self._started_at = time.monotonic()
+        self._active.set()
+
+    def pause(self):
+        """Stop taking new frames, results of a paused pipeline are dropped."""
+        self._active.clear()
+        self.poll()
+        with self._lock:
+            self.stats.frames_captured = self.grabber.frames_captured - self._captured_base
+            self.stats.elapsed = time.monotonic() - self._started_at
+
+    def warm_up(self, frame):
+        """Run one decode so library loading is not paid for by the first scan."""
+        self._pool.submit(self.decode, frame).result()
+
+    def poll(self) -> list[tuple[list[str], float]]:
+        """Return all (codes, capture_time) results decoded since the last call."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def detections(self) -> list[tuple[str, tuple[int, int, int, int]]]:
+        """Return the detections of the latest decoded frame if they are still recent."""
+        with self._lock:
+            detections, decoded_at = self._detections
+        return detections if time.monotonic() - decoded_at < OVERLAY_TTL else []
+
+    def record_latency(self, captured_at: float):
+        with self._lock:
+            self.stats.latencies.append(time.monotonic() - captured_at)
+
+    def _dispatch(self):
+        last_id = 0
+        while self._running:
+            if not self._active.wait(timeout=0.5):
+                continue
+            # Wait for a free worker first so the frame handed over is the newest one
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            frame_id, captured_at, frame = self.grabber.wait_newer(last_id)
+            if frame is None or not self._active.is_set():
+                self._slots.release()
+                if self.grabber.failed:
+                    return
+                continue
+            last_id = frame_id
+            if self.gate is not None and not self.gate.should_decode(frame):
+                self._slots.release()
+                with self._lock:
+                    self.stats.frames_skipped += 1
+                continue
+            # Decoders never draw on the frame, so it can be shared without a copy
+            self._pool.submit(self._decode, frame, captured_at)
+
+    def _decode(self, frame, captured_at: float):
+        start = time.monotonic()
+        try:
+            detections = self.decode(frame)
+        finally:
+            self._slots.release()
+        if self.gate is not None:
+            self.gate.update(bool(detections))
+        with self._lock:
+            self.stats.frames_decoded += 1
+            self.stats.decode_time += time.monotonic() - start
+            if detections:
+                self._detections = (detections, time.monotonic())
+        if detections and self._active.is_set():
+            self._results.put(([code for code, _ in detections], captured_at))
+
+
+class CameraSession:
+    """
+    Camera connection that stays open for the whole program run. The frame
+    grabber and decode workers are started once and shared by every scan,
+    a lost connection is reopened in the background. A headless session is
+    used without any preview window.
+    """
+
+    def __init__(self, address, decode, workers: int = 2, motion_gate: bool = True, headless: bool = False):
+        self.address = address
+        self.decode = decode
+        self.workers = workers
+        self.motion_gate = motion_gate
+        self.headless = headless
+        self.grabber = None
+        self.pipeline = None
+        self.payloads = PayloadCache()
+
+    def open(self) -> bool:
+        camera = self._open_capture()
+        if camera is None:
+            return False
+
+        self.grabber = FrameGrabber(camera, reconnect=self._reconnect)
+        self.grabber.start()
+        gate = MotionGate() if self.motion_gate else None
+        self.pipeline = ScanPipeline(self.grabber, self.decode, workers=self.workers, gate=gate)
+        self.pipeline.start()
+        self.pipeline.pause()
+
+        # Decode the first frame once so the first scan is as fast as later ones
+        _, _, frame = self.grabber.wait_newer(0, timeout=5)
+        if frame is not None:
+            self.pipeline.warm_up(frame)
+        return True
+
+    def close(self):
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.grabber:
+            self.grabber.stop()
+            self.grabber.camera.release()
+
+    def _open_capture(self):
+        camera = cv2.VideoCapture(self.address)
+        if not camera.isOpened():
+            camera.release()
+            return None
+        # Don't let the driver queue up frames we are going to drop anyway
+        camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return camera
+
+    def _reconnect(self):
+        click.secho("Camera connection lost, reconnecting...", bold=True, fg="yellow")
+        return self._open_capture()
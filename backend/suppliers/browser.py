@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+import pyppeteer
+from pyppeteer.errors import TimeoutError as PageTimeoutError
+
+PAGE_POOL_SIZE = 2      # Browser pages kept open for rendering
+RENDER_TIMEOUT = 30     # Seconds a page may take to load
+
+RenderedPage = namedtuple("RenderedPage", "status url html")
+
+class BrowserPool:
+    """
+    Headless Chromium that stays running for the whole session, with a pool of
+    open pages. The browser lives on its own asyncio event loop in a background
+    thread, so pages can be rendered from any thread. start() launches the
+    browser without waiting for it, render() waits only if it isn't ready yet.
+    """
+
+    def __init__(self, pages: int = PAGE_POOL_SIZE, user_agent: str = None):
+        self.pages = pages
+        self.user_agent = user_agent
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="browser")
+        self._lock = threading.Lock()
+        self._ready = None      # Future of the browser launch
+        self._browser = None
+        self._idle = None       # asyncio.Queue of pages not rendering anything
+
+    def start(self):
+        with self._lock:
+            if self._ready is None:
+                self._thread.start()
+                self._ready = asyncio.run_coroutine_threadsafe(self._launch(), self.loop)
+
+    def render(self, url: str, wait_xpath: str = None, timeout: float = RENDER_TIMEOUT) -> RenderedPage:
+        """
+        Load the url in one of the pooled pages and return the rendered HTML.
+        If wait_xpath is given, wait (up to the timeout) for that element to be rendered.
+        """
+        self.start()
+        self._ready.result()
+        return asyncio.run_coroutine_threadsafe(self._render(url, wait_xpath, timeout), self.loop).result()
+
+    def close(self):
+        with self._lock:
+            if self._ready is None:
+                return
+            try:
+                self._ready.result(timeout=RENDER_TIMEOUT)
+                asyncio.run_coroutine_threadsafe(self._browser.close(), self.loop).result(timeout=10)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+            self._ready = None
+
+    async def _launch(self):
+        # Signal handlers can only be installed from the main thread, the program closes the browser itself
+        self._browser = await pyppeteer.launch(
+            headless=True, args=["--no-sandbox"],
+            handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False
+        )
+        self._idle = asyncio.Queue()
+        for _ in range(self.pages):
+            page = await self._browser.newPage()
+            if self.user_agent:
+                await page.setUserAgent(self.user_agent)
+            self._idle.put_nowait(page)
+
+    async def _render(self, url: str, wait_xpath: str, timeout: float) -> RenderedPage:
+        page = await self._idle.get()
+        try:
+            response = await page.goto(url, timeout=int(timeout * 1000))
+            if wait_xpath:
+                try:
+                    await page.waitForXPath(wait_xpath, timeout=int(timeout * 1000))
+                except PageTimeoutError:
+                    pass
+            return RenderedPage(response.status if response else 0, page.url, await page.content())
+        finally:
+            self._idle.put_nowait(page)
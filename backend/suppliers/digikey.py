@@ -1,33 +1,90 @@
+import json
+import os
 import re
 import sys
+import tempfile
+import threading
+import time
 import click
 import requests
 
-from backend.base import Parameter, PartData, baseSupplier
+from backend.base import LookupCache, Parameter, PartData, baseSupplier
 from backend.file import fileHandler
-from backend.utilities import Tools
+from backend.parameter_map import ParameterMap
+from backend.suppliers.session import SupplierSession, endpoint
+from backend.utilities import Symbology, Tools
 
+LABEL_FIELD_RE = re.compile(r"^(\d*[A-Z])(.*)$")   # ECC 200 field: data identifier and value
+TOKEN_REFRESH_MARGIN = 60   # Seconds before expiry the bearer token is renewed in the background
+TOKEN_RETRY_DELAY = 30      # Seconds until a failed background renewal is retried
+AUTH_RETRIES = 1            # Token renewals a request may trigger after 401 responses
+REPLAY_TOKEN = "replay"     # Bearer token used while replaying recorded responses
+TOKEN_FILE = "digikey_token.json"   # Last OAuth token and its expiry, reused across restarts
+
+# DigiKey parameter IDs of every part parameter, most preferred first.
+# DigiKey might not be consistent with usage of their IDs so there is a list of possible IDs.
+PARAMETER_MAP = ParameterMap({
+    "Resistance": [2085],
+    "Power Rating": [2, 2109],
+    "Capacitance": [2049],
+    "Inductance": [2087],
+    "Voltage Rating": [14, 2079],
+    "Forward Voltage": [2261],
+    "Drain to Source Voltage": [2068],
+    "Collector to Emitter Voltage": [2103],
+    "Current Rating": [2101, 2088, 914],
+    "Reverse Leakage Current": [2269],
+    "Saturation Current": [1219],
+    "ESR": [724],
+    "Tolerance": [3],
+    "Package": [16],
+    "Temperature Coefficient": [17]
+}, key="ParameterId", value="ValueText")
 
 class DigiKey(baseSupplier):
+    symbologies = frozenset({Symbology.DATAMATRIX})
+
     def __init__(self,  utils: Tools, config):
         self.barcode_2d_re = re.compile(r"^\[\)\>") # TODO better regex (ECC 200 - EIGP 114.2018)
 
-        fs = fileHandler(config)
-        data = fs.readCredentials()
+        data = fileHandler(config).readCredentials()
         self.client_id = data["digikey"]["client-id"]
         self.client_secret = data["digikey"]["client-secret"]
+        self.token_file = data["digikey"].get("token-file", TOKEN_FILE)
         self.token = None
+        self.token_expiry = 0
+        self.session = SupplierSession.for_supplier("digikey", config)
+        self.base_url = endpoint(config, "digikey")
+        self.lookups = LookupCache()
+        self._token_lock = threading.Lock()
+        self._refresh_timer = None
 
         if self.client_id == "" or self.client_secret == "":
             click.secho("No client ID or client secret key found in config.yml file!", bold=True, fg="red")
             sys.exit(0)
 
-        self.__requestBearerToken()
+        # Reuse the token from the last run while it's still valid
+        token, expiry = self.__loadToken()
+        if token and expiry - time.time() > TOKEN_REFRESH_MARGIN:
+            self.token, self.token_expiry = token, expiry
+            self.__scheduleRefresh(expiry - time.time() - TOKEN_REFRESH_MARGIN)
+        else:
+            self.__requestBearerToken()
+
+    @classmethod
+    def configured(cls, config) -> bool:
+        data = fileHandler(config).readCredentials().get("digikey", {})
+        return data.get("client-id", "") != "" and data.get("client-secret", "") != ""
+
+    def recognizes(self, code: str) -> bool:
+        return re.match(self.barcode_2d_re, code) is not None
 
     def parseCode(self, code: str) -> str:
         if re.match(self.barcode_2d_re, code):
             return code
-        elif self.__getProductDetails(code):
+        elif (details := self.__getProductDetails(code)):
+            # A Data Matrix that isn't a DigiKey label, keep the response for the query that follows
+            self.lookups.put(code, details)
             return code
         
         return None
@@ -36,7 +93,7 @@ class DigiKey(baseSupplier):
         if re.match(self.barcode_2d_re, code):
             response = self.__query2dcode(code)
         else:
-            response = self.__getProductDetails(code)
+            response = self.lookups.pop(code) or self.__getProductDetails(code)
 
         if response is None:
             click.secho(f"No data found!")
@@ -59,102 +116,155 @@ class DigiKey(baseSupplier):
             note = None 
         )
 
+    def labelData(self, code: str) -> PartData:
+        if not re.match(self.barcode_2d_re, code):
+            return None
+
+        fields = self.__labelFields(code)
+        if not fields.get("30P"):
+            return None
+        quantity = fields.get("Q", "")
+        return PartData.from_label(fields["30P"], fields.get("1P"), int(quantity) if quantity.isdigit() else None)
+
+    def cacheKey(self, code: str) -> str:
+        if re.match(self.barcode_2d_re, code):
+            return self.__labelFields(code).get("30P") or code
+        return code
+
     def __query2dcode(self, code: str):
         """
         Decode a 2D label string into manufacturer and supplier part numbers,
         then fetch full product details using the supplier part number.
+        """
+        supplier_part_number = self.__labelFields(code).get("30P")
+        if not supplier_part_number:
+            return None
+
+        return self.__getProductDetails(supplier_part_number)
+
+    def __labelFields(self, code: str) -> dict:
+        """
+        Split an ECC 200 label into its fields by data identifier (1P, 30P, Q, ...).
 
         https://forum.digikey.com/t/digikey-product-labels-decoding-digikey-barcodes/41097
         """
+        fields = {}
         # Split segments separated by GS (Group Separator, hex 1D)
-        code_segments = code.split("\x1d")
-
-        # Extract manufacturer and supplier segments by prefix
-        manufacturer_part_number = next(seg.replace("1P", "") for seg in code_segments if seg.startswith("1P"))
-        supplier_part_number = next(seg.replace("30P", "") for seg in code_segments if seg.startswith("30P"))
-
-        return self.__getProductDetails(supplier_part_number)
+        for segment in code.split("\x1d")[1:]:
+            if (match := re.match(LABEL_FIELD_RE, segment.rstrip("\x1e\x04"))):
+                fields.setdefault(match.group(1), match.group(2))
+        return fields
 
     def __getProductDetails(self, part_number):
         """
         Perform a GET request to DigiKey's productdetails endpoint,
-        refreshing the token if unauthorized.
+        refreshing the token if unauthorized (at most AUTH_RETRIES times).
         """
-        while True:
-            product_details_url = f'https://api.digikey.com/products/v4/search/{part_number}/productdetails'
+        for attempt in range(AUTH_RETRIES + 1):
+            token = self.token
+            product_details_url = f'{self.base_url}/products/v4/search/{part_number}/productdetails'
             headers = {
-                'Authorization': f'Bearer {self.token}',
+                'Authorization': f'Bearer {token}',
                 'X-DIGIKEY-Client-Id': self.client_id,
                 'X-DIGIKEY-Locale-Site': 'US',
                 'X-DIGIKEY-Locale-Language': 'en',
                 'X-DIGIKEY-Locale-Currency': 'USD'
             }
-            response = requests.get(product_details_url, headers=headers)
+            try:
+                response = self.session.get(product_details_url, headers=headers)
+            except requests.RequestException as e:
+                click.secho(f"DigiKey API Web request error! {e}", bold=True, fg="red")
+                return None
 
             if response.status_code == 200:
                 return response.json()
-            elif response.status_code == 401 and 'detail' in response.json():
-                # If token expired or invalid, re-request and retry
-                if 'The Bearer token is invalid' in response.json()['detail']:
-                    self.__requestBearerToken()
-                    continue
-                else:
-                    click.secho(f"DigiKey API Web request error! {response.json()['detail']}", bold=True, color="red")
-            else:
-                break
+            elif response.status_code == 401 and attempt < AUTH_RETRIES:
+                # Token expired or was revoked, renew it unless another request already did
+                with self._token_lock:
+                    if self.token == token:
+                        self.__requestBearerToken()
+                continue
+            elif response.status_code == 401:
+                try:
+                    detail = response.json().get('detail', response.text)
+                except ValueError:
+                    detail = response.text
+                click.secho(f"DigiKey API Web request error! {detail}", bold=True, fg="red")
+            break
         return None
     
     def __requestBearerToken(self):
         """
-        Obtain OAuth2 bearer token using client credentials.
+        Obtain OAuth2 bearer token using client credentials, store it in the
+        config and schedule its renewal shortly before it expires.
         """
-        token_url = 'https://api.digikey.com/v1/oauth2/token'
+        if self.session.replay:
+            # The token isn't recorded and replayed responses don't need one
+            self.token, self.token_expiry = REPLAY_TOKEN, time.time() + 3600
+            return
+
+        token_url = f'{self.base_url}/v1/oauth2/token'
         data = {'grant_type': 'client_credentials', 'client_id': self.client_id, 'client_secret': self.client_secret}
-        response = requests.post(token_url, data=data)
+        try:
+            # Not an API call, it doesn't count against the rate limit or daily quota.
+            # The response holds credentials, so it's never saved to the fixtures
+            response = self.session.post(token_url, data=data, metered=False, record=False)
+        except requests.RequestException as e:
+            print("Failed to get access token:", e)
+            self.__tokenFailed()
+            return
 
-        if response.status_code == 200:
-            self.token = response.json()['access_token']
-        else:
+        if response.status_code != 200:
             print("Failed to get access token:", response.text)
+            self.__tokenFailed()
+            return
+
+        token = response.json()
+        self.token = token['access_token']
+        self.token_expiry = time.time() + token['expires_in']
+        self.__saveToken()
+        self.__scheduleRefresh(token['expires_in'] - TOKEN_REFRESH_MARGIN)
+
+    def __loadToken(self) -> tuple[str, float]:
+        try:
+            with open(self.token_file, "r") as f:
+                data = json.load(f)
+            return data["token"], data["expiry"]
+        except (OSError, ValueError, KeyError):
+            return None, 0
+
+    def __saveToken(self):
+        # Written to a temporary file and renamed, so a reader never sees half a file
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=directory, prefix=".digikey_token", delete=False) as f:
+                json.dump({"token": self.token, "expiry": int(self.token_expiry)}, f)
+            os.replace(f.name, self.token_file)
+        except OSError as e:
+            print("Failed to save access token:", e)
+
+    def __tokenFailed(self):
+        # Keep a token that's still valid and try again later
+        if self.token is not None and self.token_expiry > time.time():
+            self.__scheduleRefresh(TOKEN_RETRY_DELAY)
+        else:
             self.token = None
 
+    def __refreshToken(self):
+        with self._token_lock:
+            self.__requestBearerToken()
+
+    def __scheduleRefresh(self, delay: float):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        self._refresh_timer = threading.Timer(max(delay, 0), self.__refreshToken)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def close(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        self.session.close()
+
     def _mapParameters(self, supplier_params) -> list[Parameter]:
-        # Create easily searchable map containing digikey parameters
-        param_map = { p["ParameterId"]: p for p in supplier_params }
-
-        # Create map of parameters defined in VALID_PART_PARAMETERS and DigiKey parameter IDs.
-        # Digikey might not be consistent with usage of their IDs so there is a list of possible IDs.
-        id_map = {
-            "Resistance": [2085],
-            "Power Rating": [2, 2109],
-            "Capacitance": [2049],
-            "Inductance": [2087],
-            "Voltage Rating": [14, 2079],
-            "Forward Voltage": [2261],
-            "Drain to Source Voltage": [2068],
-            "Collector to Emitter Voltage": [2103],
-            "Current Rating": [2101, 2088, 914],
-            "Reverse Leackage Current": [2269],
-            "Saturation Current": [1219],
-            "ESR": [724],
-            "Tolerance": [3],
-            "Package": [16],
-            "Temperature Coefficient": [17]
-        }
-        params = []
-
-        # Check if there are any DigiKey parameters with matching ids 
-        # and add them to our standardized parameter list
-        for param_name, possible_ids in id_map.items():
-            for digi_id in possible_ids:
-                # Try to fetch the dict for this DigiKey ID; if found, param_dict is truthy
-                if (param_dict := param_map.get(digi_id)):
-                    if param_dict["ValueText"] != "" and param_dict["ValueText"] != "-":
-                        params.append(Parameter(
-                            name=param_name,
-                            value_str=param_dict["ValueText"]
-                        ))
-                        break   # stop checking other IDs for this param_name
-        
-        
-        return params
\ No newline at end of file
+        return PARAMETER_MAP.map(supplier_params)
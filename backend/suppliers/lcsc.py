@@ -3,22 +3,65 @@ from typing import TYPE_CHECKING
 
 import re
 import json
+import threading
+import requests
 from parsel import Selector
-from backend.base import NORMALIZED_PARAM_NAMES, baseSupplier, PartData, Parameter
+from backend.base import LookupCache, baseSupplier, PartData, Parameter
+from backend.parameter_map import ParameterMap
+from backend.suppliers.browser import BrowserPool, RenderedPage
+from backend.suppliers.replay import fixture_key
+from backend.suppliers.session import SupplierSession, endpoint
+from backend.utilities import Symbology
 
 if TYPE_CHECKING:
     from backend.utilities import Tools
 
-from requests_html import HTMLSession
+SEARCH_PATH = "/search?q="
+PRODUCT_DETAIL_PATH = "/ftps/wm/product/detail"
+SPECIFICATION_TABLE_XPATH = "(//div[contains(@class, 'v-data-table__wrapper')]//table)"
+
+# LCSC specification names of every part parameter, most preferred first (case and spaces are ignored)
+PARAMETER_MAP = ParameterMap({
+    "Resistance": ["Resistance"],
+    "Power Rating": ["Power Rating", "Power(Watts)", "Power"],
+    "Capacitance": ["Capacitance"],
+    "Inductance": ["Inductance"],
+    "Voltage Rating": ["Voltage Rating", "Voltage Rated", "Rated Voltage"],
+    "Forward Voltage": ["Forward Voltage", "Forward Voltage (Vf@If)", "Forward Voltage (Vf) @ If"],
+    "Drain to Source Voltage": ["Drain to Source Voltage", "Drain Source Voltage (Vdss)"],
+    "Collector to Emitter Voltage": ["Collector to Emitter Voltage", "Collector-Emitter Breakdown Voltage (Vceo)"],
+    "Current Rating": ["Current Rating", "Rated Current"],
+    "Reverse Leakage Current": ["Reverse Leakage Current", "Reverse Leakage Current (Ir)"],
+    "Saturation Current": ["Saturation Current", "Saturation Current (Isat)"],
+    "ESR": ["ESR", "Equivalent Series Resistance (ESR)"],
+    "Tolerance": ["Tolerance"],
+    "Package": ["Package"],
+    "Temperature Coefficient": ["Temperature Coefficient"]
+}, key="paramNameEn", value="paramValueEn", by_name=True)
 
 class LCSC(baseSupplier):
     """Supplier implementation for LCSC Electronics (https://www.lcsc.com/)"""
 
+    symbologies = frozenset({Symbology.QR})
+
+    # Page scraping, keep the load on the website low
+    max_concurrency = 2
+
     def __init__(self, utils: Tools, config):
         self.LCSC_NUM = re.compile(r'pc:(C\d*)')
+        self.LCSC_MPN = re.compile(r'pm:([^,}]+)')
+        self.LCSC_QTY = re.compile(r'qty:(\d+)')
+        self.labels = LookupCache()
         self.utils = utils
         self.headers = {'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36 uacq'}
-        self.session = HTMLSession()
+        self.session = SupplierSession.for_supplier("lcsc", config)
+        self.search_url = endpoint(config, "lcsc") + SEARCH_PATH
+        self.product_detail_url = endpoint(config, "lcsc-api") + PRODUCT_DETAIL_PATH
+        self.browser = None
+        self._browser_lock = threading.Lock()
+
+    def recognizes(self, code: str) -> bool:
+        return re.search(self.LCSC_NUM, code) is not None
 
     def parseCode(self, code: str) -> str:
         """
@@ -36,52 +79,50 @@ class LCSC(baseSupplier):
                 print("Invalid barcode!")
                 return None
 
+            # Keep what the label says for labelData
+            mpn = re.search(self.LCSC_MPN, code)
+            quantity = re.search(self.LCSC_QTY, code)
+            self.labels.put(LCSCPartNumber, PartData.from_label(
+                LCSCPartNumber, mpn.group(1) if mpn else None, int(quantity.group(1)) if quantity else None
+            ))
             return LCSCPartNumber
         except:
             return None
     
+    def labelData(self, code: str) -> PartData:
+        return self.labels.pop(code)
+
     def query(self, partNumber) -> PartData:
         # queries the LCSC API for the part number and returns the data
-        query = "https://www.lcsc.com/search?q=" + partNumber
-        response = self.session.get(query, headers=self.headers)
+        query = self.search_url + partNumber
         try:
+            # The server side HTML already contains the product data, only render the page if it doesn't
+            response = self.session.get(query, headers=self.headers)
             if response.status_code != 200:
                 return None
-            
-            # Reder the website to get full specification table
-            response.html.render()
-            sel = Selector(response._html.html)
+            sel = Selector(response.text)
+            link = response.url
 
             try:
+                data = self.__productData(sel)
+                if data is None:
+                    page = self.__render(query)
+                    if page.status != 200:
+                        return None
+                    sel = Selector(page.html)
+                    link = page.url
+                    data = self.__productData(sel)
+
                 parameters = []
-                specification_table_path = "(//div[contains(@class, 'v-data-table__wrapper')]//table)"
-                table = sel.xpath(specification_table_path)
-
-                if not table:
-                    raise Exception()
-                    #raise Exception(f"Product specifications table not found! xpath={specification_table_path}")
-
-                # Scrape parameters from the specification table 
-                rows = table[0].xpath(".//tbody/tr")
-                for r in rows:
-                    cells = r.xpath("./td")
-                    if len(cells) >= 2:
-                        key = r.xpath("string(./td[1])").get().strip()
-                        val = r.xpath("string(./td[2])").get().strip()
-                        if key.lower().replace(" ", "") in NORMALIZED_PARAM_NAMES.keys() and val != "-":
-                            parameters.append(Parameter(
-                                name = key, value_str = val
-                            ))
-
-                # gets the content of script tag containing full info
-                raw = sel.xpath("""//head/script[
-                                  @type="application/ld+json"
-                                  and contains(., '"@type"')
-                                  and contains(., 'Product')
-                                  and contains(., '"mpn"')
-                                ]/text()
-                                """).get()
-                data = json.loads(raw) if raw else None
+                if self.use_parameters:
+                    parameters = self.__specificationTable(sel)
+                    if parameters is None:
+                        parameters = self.__fetchParameters(partNumber)
+                    if parameters is None:
+                        parameters = self.__specificationTable(Selector(self.__render(query).html))
+                    if parameters is None:
+                        raise Exception()
+                        #raise Exception(f"Product specifications table not found! xpath={SPECIFICATION_TABLE_XPATH}")
 
                 return PartData(
                     name = data["name"],
@@ -89,7 +130,7 @@ class LCSC(baseSupplier):
                     manufacturer_pn= data["mpn"],
                     description = data["description"],
                     remote_image = data["image"],
-                    link = response.url,
+                    link = link,
                     unit_price = float(data["offers"]["price"]),
                     parameters=parameters,
                     keywords= f"{partNumber}, {data["mpn"]}",
@@ -107,6 +148,67 @@ class LCSC(baseSupplier):
             print(e)
             print("Invalid part number!")
             return None
-        
+
+    def close(self):
+        self.session.close()
+        if self.browser is not None:
+            self.browser.close()
+
     def _mapParameters(self, supplier_params) -> list[Parameter]:
-        pass
\ No newline at end of file
+        return PARAMETER_MAP.map(supplier_params)
+
+    def __render(self, url: str) -> RenderedPage:
+        # Rendered pages bypass the session, so they're recorded and replayed here
+        fixtures = self.session.fixtures
+        key = fixture_key("RENDER", url)
+        if self.session.replay:
+            if (fixture := fixtures.load(key)) is None:
+                raise requests.ConnectionError(f"No recorded render of {url}")
+            return RenderedPage(fixture["status"], fixture["url"], fixture["body"])
+
+        # Chromium is only started once a page actually needs rendering
+        with self._browser_lock:
+            if self.browser is None:
+                self.browser = BrowserPool(user_agent=self.headers['User-Agent'])
+        page = self.browser.render(url, wait_xpath=SPECIFICATION_TABLE_XPATH)
+        if fixtures is not None and page.status == 200:
+            fixtures.save_page(key, page.status, page.url, page.html)
+        return page
+
+    def __productData(self, sel: Selector) -> dict:
+        # gets the content of script tag containing full info
+        raw = sel.xpath("""//head/script[
+                          @type="application/ld+json"
+                          and contains(., '"@type"')
+                          and contains(., 'Product')
+                          and contains(., '"mpn"')
+                        ]/text()
+                        """).get()
+        return json.loads(raw) if raw else None
+
+    def __specificationTable(self, sel: Selector) -> list[Parameter]:
+        table = sel.xpath(SPECIFICATION_TABLE_XPATH)
+        if not table:
+            return None
+
+        # Scrape parameters from the specification table, named like the product detail JSON fields
+        rows = []
+        for r in table[0].xpath(".//tbody/tr"):
+            if len(r.xpath("./td")) >= 2:
+                rows.append({
+                    "paramNameEn": r.xpath("string(./td[1])").get(),
+                    "paramValueEn": r.xpath("string(./td[2])").get(),
+                })
+        return self._mapParameters(rows)
+
+    def __fetchParameters(self, partNumber) -> list[Parameter]:
+        # The same product detail JSON the page loads to fill in its specification table
+        try:
+            response = self.session.get(self.product_detail_url, params={"productCode": partNumber}, headers=self.headers)
+            if response.status_code != 200:
+                return None
+            params = response.json()["result"]["paramVOList"]
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return None
+
+        return self._mapParameters(params or [])
@@ -0,0 +1,176 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+
+from backend.base import Parameter, PartData, baseSupplier
+from backend.suppliers.digikey import DigiKey
+from backend.suppliers.lcsc import LCSC
+from backend.suppliers.tme import TME
+from backend.utilities import Tools
+
+SUPPLIERS = (LCSC, DigiKey, TME)
+
+class MultiSupplier(baseSupplier):
+    """
+    Uses all configured suppliers at once. Scanned labels are routed to their
+    supplier by a network-free pattern check, part numbers that don't match
+    any supplier's labels (typed in by hand) are looked up at every supplier
+    at the same time and the first one that finds the part wins. Background
+    lookups go through every supplier's own aquery/aquery_many, so their
+    concurrency limits and batched API calls still apply.
+    """
+
+    def __init__(self, utils: Tools, config, suppliers: tuple = SUPPLIERS):
+        self.suppliers = [supplier(utils, config) for supplier in suppliers if supplier.configured(config)]
+        if not self.suppliers:
+            click.secho("No supplier is configured in the config.yml file!", bold=True, fg="red")
+            sys.exit(0)
+        click.echo("Using " + ", ".join(type(s).__name__ for s in self.suppliers))
+
+        self.symbologies = frozenset().union(*(s.symbologies for s in self.suppliers))
+        self.thread_safe = all(s.thread_safe for s in self.suppliers)
+        self.max_concurrency = sum(s.max_concurrency for s in self.suppliers)
+        self.routes = {}    # part number returned by parseCode -> supplier it belongs to
+        self.pool = ThreadPoolExecutor(max_workers=len(self.suppliers), thread_name_prefix="multi")
+
+    @property
+    def use_parameters(self) -> bool:
+        return all(s.use_parameters for s in self.suppliers)
+
+    @use_parameters.setter
+    def use_parameters(self, value: bool):
+        for s in self.suppliers:
+            s.use_parameters = value
+
+    def recognizes(self, code: str) -> bool:
+        return self.__route(code) is not None
+
+    def parseCode(self, code: str) -> str:
+        # Only labels of a known supplier are accepted, other codes on the bag are ignored
+        supplier = self.__route(code)
+        if supplier is None:
+            return None
+
+        part_number = supplier.parseCode(code)
+        if part_number is not None:
+            self.routes[part_number] = supplier
+        return part_number
+
+    def labelData(self, code: str) -> PartData:
+        supplier = self.routes.get(code) or self.__route(code)
+        return supplier.labelData(code) if supplier is not None else None
+
+    def supplierNames(self, code: str) -> list[str]:
+        supplier = self.routes.get(code) or self.__route(code)
+        if supplier is not None:
+            return supplier.supplierNames(code)
+        return [name for s in self.suppliers for name in s.supplierNames(code)]
+
+    def cacheKey(self, code: str) -> str:
+        supplier = self.routes.get(code) or self.__route(code)
+        return supplier.cacheKey(code) if supplier is not None else code
+
+    def query(self, code) -> PartData:
+        supplier = self.routes.get(code)
+        if supplier is None and (supplier := self.__route(code)) is not None:
+            # A whole label typed or pasted in
+            code = supplier.parseCode(code)
+            if code is None:
+                return None
+        if supplier is not None:
+            return supplier.query(code)
+
+        # Typed in by hand, any supplier could have it
+        lookups = {self.pool.submit(s.query, code): s for s in self.suppliers}
+        for lookup in as_completed(lookups):
+            try:
+                part_data = lookup.result()
+            except Exception as e:
+                click.secho(f"{type(lookups[lookup]).__name__} lookup failed! {e}", fg="red")
+                continue
+            if part_data is not None:
+                for other in lookups:
+                    other.cancel()
+                # Remember who had it, for supplierNames
+                self.routes[code] = lookups[lookup]
+                return part_data
+        return None
+
+    async def aquery(self, code) -> PartData:
+        # Through the supplier's own aquery, so its concurrency limit applies
+        supplier, code = await self.__aroute(code)
+        if supplier is not None:
+            return await supplier.aquery(code) if code is not None else None
+
+        # Typed in by hand, race every supplier
+        async def ask(supplier):
+            try:
+                return supplier, await supplier.aquery(code)
+            except Exception as e:
+                click.secho(f"{type(supplier).__name__} lookup failed! {e}", fg="red")
+                return supplier, None
+
+        lookups = [asyncio.ensure_future(ask(s)) for s in self.suppliers]
+        try:
+            for lookup in asyncio.as_completed(lookups):
+                supplier, part_data = await lookup
+                if part_data is not None:
+                    # Remember who had it, for supplierNames
+                    self.routes[code] = supplier
+                    return part_data
+            return None
+        finally:
+            for other in lookups:
+                other.cancel()
+
+    async def aquery_many(self, codes: list[str]) -> list[PartData]:
+        # Codes of one supplier go to its aquery_many together, so TME still batches its API calls
+        groups = {}
+        for index, code in enumerate(codes):
+            groups.setdefault(self.routes.get(code), []).append(index)
+        unrouted = groups.pop(None, [])
+
+        async def query_group(supplier, indexes):
+            return await supplier.aquery_many([codes[i] for i in indexes])
+
+        results = [None] * len(codes)
+        group_results = await asyncio.gather(
+            *(query_group(supplier, indexes) for supplier, indexes in groups.items()),
+            *(self.aquery(codes[i]) for i in unrouted),
+            return_exceptions=True
+        )
+        for indexes, result in zip(groups.values(), group_results):
+            # A whole group failing fails only its own codes
+            for i, part_data in zip(indexes, result if not isinstance(result, BaseException) else [result] * len(indexes)):
+                results[i] = part_data
+        for i, part_data in zip(unrouted, group_results[len(groups):]):
+            results[i] = part_data
+        return results
+
+    def lookupBatches(self, codes: list[str]) -> list[list[str]]:
+        groups = {}
+        for code in codes:
+            groups.setdefault(self.routes.get(code), []).append(code)
+        unrouted = groups.pop(None, [])
+        return [batch for supplier, group in groups.items() for batch in supplier.lookupBatches(group)] + [[code] for code in unrouted]
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for s in self.suppliers:
+            s.close()
+
+    def _mapParameters(self, supplier_params) -> list[Parameter]:
+        pass
+
+    def __route(self, code: str) -> baseSupplier:
+        return next((s for s in self.suppliers if s.recognizes(code)), None)
+
+    async def __aroute(self, code: str) -> tuple[baseSupplier, str]:
+        """Supplier of the code and the part number to ask it for, (None, code) if the code isn't routed."""
+        supplier = self.routes.get(code)
+        if supplier is None and (supplier := self.__route(code)) is not None:
+            # A whole label typed or pasted in, parseCode may need the network
+            code = await asyncio.to_thread(supplier.parseCode, code)
+        return supplier, code
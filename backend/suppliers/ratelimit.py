@@ -0,0 +1,172 @@
+import datetime
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+
+from backend.file import fileHandler
+
+QUOTA_FILE = "api_quota.json"   # Requests sent to every supplier API today
+BACKOFF_BASE = 2                # Seconds waited after the first 429 response without Retry-After
+BACKOFF_MAX = 60                # Longest wait before retrying a throttled request
+
+# Default (requests per minute, requests per day) of every supplier, 0 for no limit
+RATE_LIMITS = {
+    "digikey": (120, 1000),
+    "tme": (300, 0),
+    "lcsc": (60, 0),
+}
+
+class QuotaExceeded(requests.RequestException):
+    """Raised instead of sending a request once the daily budget is used up"""
+
+class DailyBudget:
+    """
+    Number of requests sent to every supplier today, kept on disk so a
+    restart doesn't reset it. The count starts over on a new (local) day.
+    Get it with shared(), every limiter using the same file must count in the
+    same instance or their writes overwrite each other's counts.
+    """
+
+    _budgets = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: str = QUOTA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = None
+        self._used = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                self._day, self._used = data["day"], data["used"]
+            except (ValueError, KeyError, OSError):
+                pass
+
+    @classmethod
+    def shared(cls, path: str = QUOTA_FILE) -> 'DailyBudget':
+        """The one budget kept in the given file"""
+        with cls._registry_lock:
+            key = os.path.abspath(path)
+            if key not in cls._budgets:
+                cls._budgets[key] = cls(path)
+            return cls._budgets[key]
+
+    def used(self, name: str) -> int:
+        with self._lock:
+            self.__rollover()
+            return self._used.get(name, 0)
+
+    def spend(self, name: str, limit: int):
+        """Count one request, raises QuotaExceeded if the limit (0 for none) is reached."""
+        with self._lock:
+            self.__rollover()
+            used = self._used.get(name, 0)
+            if limit and used >= limit:
+                raise QuotaExceeded(f"Daily {name} API quota of {limit} requests used up!")
+            self._used[name] = used + 1
+            with open(self.path, "w") as f:
+                json.dump({"day": self._day, "used": self._used}, f)
+
+    def __rollover(self):
+        today = datetime.date.today().isoformat()
+        if self._day != today:
+            self._day = today
+            self._used = {}
+
+class RateLimiter:
+    """
+    Token bucket limiting the requests sent to one supplier API, shared by all
+    of the supplier's sessions and threads. The burst is sized so no sliding
+    minute sees more than per_minute requests (a limit of one a minute can let
+    a second one through at the end of the minute). A 429 response pauses the
+    whole bucket, not just the request that got it.
+    """
+
+    _limiters = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name: str, per_minute: int, per_day: int, budget: DailyBudget):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.budget = budget
+        self.burst = max(1, per_minute // 10)
+        # Tokens added per second, at least one a minute so very low limits still refill
+        self.rate = max(per_minute - self.burst, 1) / 60 if per_minute else 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_supplier(cls, name: str, config: str) -> 'RateLimiter':
+        """Shared limiter of a supplier, rates are read from the [rate-limits.<name>] config section."""
+        with cls._registry_lock:
+            if name not in cls._limiters:
+                settings = fileHandler(config).readCredentials().get("rate-limits", {})
+                limits = settings.get(name, {})
+                per_minute, per_day = RATE_LIMITS.get(name, (0, 0))
+                budget = DailyBudget.shared(settings.get("quota-file", QUOTA_FILE))
+                cls._limiters[name] = cls(name, limits.get("per-minute", per_minute), limits.get("per-day", per_day), budget)
+            return cls._limiters[name]
+
+    @property
+    def remaining(self) -> int:
+        """Requests left in today's budget, None if there is no daily limit"""
+        if not self.per_day:
+            return None
+        return max(self.per_day - self.budget.used(self.name), 0)
+
+    def acquire(self):
+        """Block until a request may be sent, raises QuotaExceeded if the daily budget is used up."""
+        self.budget.spend(self.name, self.per_day)
+        if not self.per_minute:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back all requests to the supplier for the given time."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def backoff(self, response: requests.Response, attempt: int) -> float:
+        """Pause after a throttled response, returns the seconds paused."""
+        delay = retry_after(response)
+        if delay is None:
+            # Exponential backoff with jitter, so waiting threads don't all retry at the same moment
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.5)
+        delay = min(delay, BACKOFF_MAX)
+        self.pause(delay)
+        return delay
+
+def retry_after(response: requests.Response) -> float:
+    """Seconds requested by the Retry-After header (delay or HTTP date), None without one."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+FIXTURE_DIR = "fixtures"    # Recorded supplier responses
+
+# Credentials and signatures differ between machines, they don't identify a request
+IGNORED_FIELDS = frozenset({"Token", "ApiSignature", "client_id", "client_secret"})
+
+def fixture_key(method: str, url: str, body: bytes | str = None) -> str:
+    """
+    Identify a request by method, path, query and form body, without the host
+    so a fixture matches whatever base URL the supplier is configured with.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k not in IGNORED_FIELDS))
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    form = urlencode(sorted((k, v) for k, v in parse_qsl(body or "") if k not in IGNORED_FIELDS))
+    return f"{method.upper()} {parts.path}?{query} {form}"
+
+class FixtureStore:
+    """
+    Directory of recorded supplier responses, one JSON file per request.
+    Used by SupplierSession to record or replay responses and by the stub
+    server in benchmarks/ to serve them.
+    """
+
+    def __init__(self, path: str = FIXTURE_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> dict:
+        try:
+            with open(self.__file(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, response: requests.Response):
+        self.save_page(key, response.status_code, response.url, response.text, response.headers.get("Content-Type", ""))
+
+    def save_page(self, key: str, status: int, url: str, body: str, content_type: str = "text/html"):
+        """Save a response that didn't come through requests, e.g. a page rendered in a browser."""
+        fixture = {
+            "key": key,
+            "url": url,
+            "status": status,
+            "content_type": content_type,
+            "body": body,
+        }
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.__file(key), "w", encoding="utf-8") as f:
+                json.dump(fixture, f, indent=1, ensure_ascii=False)
+
+    def response(self, key: str, request: requests.PreparedRequest) -> requests.Response:
+        """Recorded response of the request, raises ConnectionError if none was recorded."""
+        fixture = self.load(key)
+        if fixture is None:
+            raise requests.ConnectionError(f"No recorded response for {key}", request=request)
+
+        response = requests.Response()
+        response.status_code = fixture["status"]
+        response.headers = CaseInsensitiveDict({"Content-Type": fixture["content_type"]})
+        response._content = fixture["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = fixture["url"]
+        response.request = request
+        return response
+
+    def __file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".json")
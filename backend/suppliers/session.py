@@ -0,0 +1,85 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.file import fileHandler
+from backend.suppliers.ratelimit import RateLimiter
+from backend.suppliers.replay import FIXTURE_DIR, FixtureStore, fixture_key
+
+CONNECT_TIMEOUT = 5     # Seconds to establish a connection to the supplier API
+READ_TIMEOUT = 20       # Seconds to wait for the supplier API to answer
+POOL_SIZE = 8           # Keep-alive connections kept open per host
+THROTTLE_RETRIES = 3    # Retries of a request answered with 429 Too Many Requests
+
+# Default base URLs, can be changed in the [endpoints] config section (e.g. to a local stub server)
+ENDPOINTS = {
+    "digikey": "https://api.digikey.com",
+    "tme": "https://api.tme.eu",
+    "lcsc": "https://www.lcsc.com",
+    "lcsc-api": "https://wmsc.lcsc.com",
+}
+
+def endpoint(config, name: str) -> str:
+    """Base URL of a supplier API without the trailing slash"""
+    return fileHandler(config).readCredentials().get("endpoints", {}).get(name, ENDPOINTS[name]).rstrip("/")
+
+class SupplierSession(requests.Session):
+    """
+    HTTP session owned by a supplier. Connections are pooled and kept alive
+    between API calls, so only the first call pays for the TCP and TLS
+    handshake. Every request gets connect/read timeouts unless the caller
+    passes its own, a hung API can't freeze the station. With a limiter every
+    request waits for its rate limit, throttled requests are retried after
+    the requested or a backoff delay. With fixtures responses are recorded,
+    or replayed from them without any network access.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, timeout: tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 limiter: RateLimiter = None, fixtures: FixtureStore = None, replay: bool = False):
+        super().__init__()
+        self.timeout = timeout
+        self.limiter = limiter
+        self.fixtures = fixtures
+        self.replay = replay
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    @classmethod
+    def for_supplier(cls, name: str, config) -> 'SupplierSession':
+        """Session with the supplier's rate limiter, recording or replaying as set in the [fixtures] config section"""
+        settings = fileHandler(config).readCredentials().get("fixtures", {})
+        mode = settings.get("mode", "off")
+        fixtures = FixtureStore(settings.get("path", FIXTURE_DIR)) if mode in ("record", "replay") else None
+        return cls(limiter=RateLimiter.for_supplier(name, config), fixtures=fixtures, replay=mode == "replay")
+
+    def request(self, method, url, metered: bool = True, record: bool = True, **kwargs):
+        """
+        metered=False sends the request outside the rate limit and daily budget,
+        record=False keeps it out of the fixtures, e.g. for authentication.
+        A request that isn't recorded can't be replayed either.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if self.fixtures is None or not record:
+            return self.__send(method, url, metered, **kwargs)
+
+        # Encoded like the real request, so the key is the same the stub server computes
+        prepared = requests.Request(method, url, params=kwargs.get("params"), data=kwargs.get("data"), json=kwargs.get("json")).prepare()
+        key = fixture_key(method, prepared.url, prepared.body)
+        if self.replay:
+            return self.fixtures.response(key, prepared)
+
+        response = self.__send(method, url, metered, **kwargs)
+        if response.status_code != 429 and response.status_code < 500:
+            self.fixtures.save(key, response)
+        return response
+
+    def __send(self, method, url, metered, **kwargs):
+        if self.limiter is None or not metered:
+            return super().request(method, url, **kwargs)
+
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self.limiter.acquire()
+            response = super().request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == THROTTLE_RETRIES:
+                return response
+            self.limiter.backoff(response, attempt)
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import hashlib
 import hmac
@@ -6,26 +7,68 @@ import sys
 
 import click
 import urllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 from backend.file import fileHandler
-from backend.utilities import Tools
-from backend.base import Parameter, PartData, baseSupplier
+from backend.parameter_map import ParameterMap
+from backend.suppliers.session import POOL_SIZE, SupplierSession, endpoint
+from backend.utilities import Symbology, Tools
+from backend.base import LookupCache, Parameter, PartData, baseSupplier
+
+SYMBOL_LIMIT = 50   # Maximum number of symbols in one TME Products API call
+
+# TME parameter IDs of every part parameter, most preferred first.
+# TME might not be consistent with usage of their IDs so there is a list of possible IDs.
+PARAMETER_MAP = ParameterMap({
+    "Resistance": [38],
+    "Power Rating": [3409, 36, 589, 564],
+    "Capacitance": [118],
+    "Inductance": [566],
+    "Voltage Rating": [243, 45, 120],
+    "Forward Voltage": [226],
+    "Drain to Source Voltage": [262],
+    "Collector to Emitter Voltage": [261],
+    "Current Rating": [234, 370, 268, 266, 1101],
+    "Reverse Leakage Current": [245],
+    "Saturation Current": [577],
+    "ESR": [2260],
+    "Tolerance": [39],
+    "Package": [35, 2931],
+    "Temperature Coefficient": [116]
+}, key="ParameterId", value="ParameterValue")
 
 class TME(baseSupplier):
+    symbologies = frozenset({Symbology.QR})
+
     def __init__(self,  utils: Tools, config):
         # self.TME_NUM = re.compile(r'^.*\bQTY:\S+.*\bPN:\S+.*\bMFR:\S+.*\bMPN:\S+.*$') # full QR code data (?)
         self.TME_NUM = re.compile(r'\bPN:(\S+)') # Part Number
+        self.TME_QTY = re.compile(r'\bQTY:(\d+)') # Quantity
+        self.TME_MPN = re.compile(r'\bMPN:(\S+)') # Manufacturer Part Number
 
         fs = fileHandler(config)
         data = fs.readCredentials()
         self.secret = data["tme"]["app-secret"]
         self.token = data["tme"]["client-token"]
+        self.session = SupplierSession.for_supplier("tme", config)
+        self.base_url = endpoint(config, "tme")
+        self.lookups = LookupCache()
+        self.labels = LookupCache()
+        self.pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="tme")
 
         if self.token == "" or self.secret == "":
             click.secho("No client token or application secret key found in config.yml file!", bold=True, fg="red")
             sys.exit(0)
 
+    @classmethod
+    def configured(cls, config) -> bool:
+        data = fileHandler(config).readCredentials().get("tme", {})
+        return data.get("client-token", "") != "" and data.get("app-secret", "") != ""
+
+    def recognizes(self, code: str) -> bool:
+        return re.search(self.TME_NUM, code) is not None
+
     def parseCode(self, code: str) -> str:
         # Attempt simple regex match
         try:
@@ -35,7 +78,13 @@ class TME(baseSupplier):
             if TMEPartNumber == "":
                 print("Invalid barcode!")
                 return None
-            
+
+            # Keep what the label says for labelData
+            quantity = re.search(self.TME_QTY, code)
+            mpn = re.search(self.TME_MPN, code)
+            self.labels.put(TMEPartNumber, PartData.from_label(
+                TMEPartNumber, mpn.group(1) if mpn else None, int(quantity.group(1)) if quantity else None
+            ))
             return TMEPartNumber
         # If regex fails, try API lookup for detailed product data
         except:
@@ -44,22 +93,114 @@ class TME(baseSupplier):
                 products = details["Data"]["ProductList"]
                 if len(products) > 1: # This shouldn't happen, but the API doc allows it
                     code = self.__resolveMultipleProducts(products)
+                    products = [product for product in products if product["Symbol"] == code]
+                # Keep the response for the query that follows
+                self.lookups.put(code, {"Data": {"ProductList": products}})
                 return code
             return None
 
+    def labelData(self, code: str) -> PartData:
+        return self.labels.pop(code)
+
     def query(self, part_number) -> PartData:
-        details = self.__getProductDetails(part_number)
-        price = self.__getProductPrice(part_number)
-        params = self.__getProductParams(part_number)
+        # Product details may already be known from parseCode
+        results = {}
+        if (details := self.lookups.pop(part_number)):
+            results["details"] = details
 
-        # Abort if any API call failed
-        if None in [details, price, params]:
-            click.secho(f"No data found!")
-            return None
+        # The API calls are independent, so they are sent at the same time
+        futures = {
+            self.pool.submit(self.__getProductPrice, part_number): "price",
+            self.pool.submit(self.__getProductParams, part_number): "params",
+        }
+        if "details" not in results:
+            futures[self.pool.submit(self.__getProductDetails, part_number)] = "details"
+
+        for future in as_completed(futures):
+            result = future.result()
+
+            # Abort if any API call failed, calls that haven't started yet are cancelled
+            # and the results of the ones in flight are discarded
+            if result is None:
+                for other in futures:
+                    other.cancel()
+                click.secho(f"No data found!")
+                return None
+
+            results[futures[future]] = result
+
+        details, price, params = results["details"], results["price"], results["params"]
 
         product_details = details["Data"]["ProductList"][0]
         product_prices = price["Data"]["ProductList"][0]["PriceList"]
+        product_params = params["Data"]["ProductList"][0]["ParameterList"]
+
+        return self.__buildPartData(product_details, product_prices, product_params)
+
+    def query_many(self, part_numbers: list[str]) -> list[PartData]:
+        """
+        Look up many part numbers with as few API calls as possible. Up to
+        SYMBOL_LIMIT symbols are sent in each GetProducts/GetPrices/GetParameters
+        call, all calls are sent at the same time.
+        Returns a PartData (None if not found) for every part number, in order.
+        """
+        # Product details may already be known from parseCode, those symbols skip GetProducts
+        known = {}
+        for part_number in part_numbers:
+            if (details := self.lookups.pop(part_number)):
+                known[part_number] = details["Data"]["ProductList"]
+
+        chunks = [part_numbers[i:i + SYMBOL_LIMIT] for i in range(0, len(part_numbers), SYMBOL_LIMIT)]
+        calls = []
+        for chunk in chunks:
+            unknown = [part_number for part_number in chunk if part_number not in known]
+            calls.append((
+                chunk,
+                self.pool.submit(self.__getProductDetails, unknown) if unknown else None,
+                self.pool.submit(self.__getProductPrice, chunk),
+                self.pool.submit(self.__getProductParams, chunk),
+            ))
+
+        products = {}
+        for chunk, details, price, params in calls:
+            details = details.result() if details is not None else {"Data": {"ProductList": []}}
+            price, params = price.result(), params.result()
+
+            # Abort the chunk if any API call failed
+            if None in [details, price, params]:
+                continue
+
+            product_list = details["Data"]["ProductList"] + [
+                product for part_number in chunk if part_number in known for product in known[part_number]
+            ]
+            prices = {p["Symbol"]: p["PriceList"] for p in price["Data"]["ProductList"]}
+            parameters = {p["Symbol"]: p["ParameterList"] for p in params["Data"]["ProductList"]}
+            for product_details in product_list:
+                symbol = product_details["Symbol"]
+                products[symbol.upper()] = self.__buildPartData(product_details, prices.get(symbol, []), parameters.get(symbol, []))
+
+        return [products.get(part_number.upper()) for part_number in part_numbers]
+
+    def lookupBatches(self, part_numbers: list[str]) -> list[list[str]]:
+        # One set of GetProducts/GetPrices/GetParameters calls answers a whole chunk
+        return [part_numbers[i:i + SYMBOL_LIMIT] for i in range(0, len(part_numbers), SYMBOL_LIMIT)]
+
+    async def aquery_many(self, part_numbers: list[str]) -> list[PartData]:
+        # Batched like query_many, every chunk of SYMBOL_LIMIT symbols takes one concurrency slot
+        async def query_chunk(chunk):
+            async with self.limiter():
+                return await asyncio.to_thread(self.query_many, chunk)
 
+        chunks = self.lookupBatches(part_numbers)
+        results = await asyncio.gather(*(query_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        # A failed chunk fails only its own part numbers
+        return [
+            part_data
+            for chunk, result in zip(chunks, results)
+            for part_data in (result if not isinstance(result, BaseException) else [result] * len(chunk))
+        ]
+
+    def __buildPartData(self, product_details, product_prices, product_params) -> PartData:
         return PartData(
             name = product_details["OriginalSymbol"],
             supplier_pn = product_details["Symbol"],
@@ -68,59 +209,67 @@ class TME(baseSupplier):
             remote_image = f"https:{product_details["Photo"]}",
             link = f"https:{product_details["ProductInformationPage"]}",
             unit_price = (min(product_prices, key=lambda item: item["Amount"], default=None) or {"PriceValue": 0})["PriceValue"],
-            parameters = self._mapParameters(params["Data"]["ProductList"][0]["ParameterList"]),
+            parameters = self._mapParameters(product_params),
             keywords= f"{product_details["Symbol"]}, {product_details["OriginalSymbol"]}",
             minimum_stock = None,
             part_count = None,
             note = None 
         )
 
-    def __getProductDetails(self, part_number):
+    def __getProductDetails(self, part_numbers):
         # Call the TME GetProducts endpoint
-        response = self.__makeRequest("GetProducts", part_number)
+        response = self.__makeRequest("GetProducts", part_numbers)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             return response.json()
         else:
             return None
 
-    def __getProductParams(self, part_number):
+    def __getProductParams(self, part_numbers):
         # Call the TME GetParameters endpoint
-        response = self.__makeRequest("GetParameters", part_number)
+        response = self.__makeRequest("GetParameters", part_numbers)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             return response.json()
         else:
             return None
         
-    def __getProductPrice(self, part_number):
+    def __getProductPrice(self, part_numbers):
         # Call the TME GetPrices endpoint
-        response = self.__makeRequest("GetPrices", part_number)
+        response = self.__makeRequest("GetPrices", part_numbers)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             return response.json()
         else:
             return None
         
-    def __makeRequest(self, url_dir, part_number):
+    def __makeRequest(self, url_dir, part_numbers):
         """
         Compose and send a signed POST request to the TME API.
+        part_numbers is a single part number or a list of up to SYMBOL_LIMIT of them.
         """
-        url = f'https://api.tme.eu/Products/{url_dir}.json'
+        if isinstance(part_numbers, str):
+            part_numbers = [part_numbers]
+
+        url = f'{self.base_url}/Products/{url_dir}.json'
         data = {
             'Token': self.token,
             'Country': 'GB',
             'Language': 'EN', 
-            'SymbolList[0]': f'{part_number}',
             'Currency': 'USD'
             #'GrossPrices': 'true' - Gross prices are available for anonymous request only
         }
+        for idx, part_number in enumerate(part_numbers):
+            data[f'SymbolList[{idx}]'] = f'{part_number}'
 
         # Append the OAuth-style signature
         data['ApiSignature'] = self.__getSignature(url, data)
 
-        response = requests.post(url, data=data)
-        return response
+        try:
+            return self.session.post(url, data=data)
+        except requests.RequestException as e:
+            click.secho(f"TME API Web request error! {e}", bold=True, fg="red")
+            return None
     
 
     def __getSignature(self, url: str, req_data: str):
@@ -135,46 +284,12 @@ class TME(baseSupplier):
         api_signature = base64.b64encode(signature).decode('utf-8')
         return api_signature
 
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
     def _mapParameters(self, supplier_params) -> list[Parameter]:
-        # Create easily searchable map containing TME parameters
-        param_map = { p["ParameterId"]: p for p in supplier_params }
-
-        # Create map of parameters defined in VALID_PART_PARAMETERS and TME parameter IDs.
-        # TME might not be consistent with usage of their IDs so there is a list of possible IDs.
-        id_map = {
-            "Resistance": [38],
-            "Power Rating": [3409, 36, 589, 564],
-            "Capacitance": [118],
-            "Inductance": [566],
-            "Voltage Rating": [243, 45, 120],
-            "Forward Voltage": [226],
-            "Drain to Source Voltage": [262],
-            "Collector to Emitter Voltage": [261],
-            "Current Rating": [234, 370, 268, 266, 1101],
-            "Reverse Leackage Current": [245],
-            "Saturation Current": [577],
-            "ESR": [2260],
-            "Tolerance": [39],
-            "Package": [35, 2931],
-            "Temperature Coefficient": [116]
-        }
-        params = []
-
-        # Check if there are any DigiKey parameters with matching ids 
-        # and add them to our standardized parameter list
-        for param_name, possible_ids in id_map.items():
-            for tme_id in possible_ids:
-                # Try to fetch the dict for this DigiKey ID; if found, param_dict is truthy
-                if (param_dict := param_map.get(tme_id)):
-                    if param_dict["ParameterValue"] != "" and param_dict["ParameterValue"] != "-":
-                        params.append(Parameter(
-                            name=param_name,
-                            value_str=param_dict["ParameterValue"]
-                        ))
-                        break   # stop checking other IDs for this param_name
-        
-        return params
-        
+        return PARAMETER_MAP.map(supplier_params)
 
     def __resolveMultipleProducts(self, products):
         """
@@ -112,11 +112,11 @@ def handle_template_creation(api: InvenTreeAPI, utils: Tools, part_data: PartDat
         is_template = True
     )
 
-def handle_part_quantity() -> int:
+def handle_part_quantity(default: int = 1) -> int:
     return click.prompt(
         f"Enter the quantity of the part",
         type=click.IntRange(min=0),
-        default=1,
+        default=default,
         show_default=True
     )
 
@@ -211,4 +211,20 @@ def select_input_option(utils: Tools) -> str:
         print("Enter camera URL/IP: ")
         address = utils.input_with_prefill(text="http://192.168.100.157:8080/video", prompt="")
 
-    return address
\ No newline at end of file
+    return address
+
+def select_part_list() -> list[str]:
+    """Optionally load supplier part numbers from a file, one per line (e.g. written by batch_decode.py)."""
+    path = click.prompt("Enter a part number list file (enter to type part numbers)", default="", show_default=False)
+    if path == "":
+        return []
+
+    try:
+        with open(path, "r") as f:
+            part_numbers = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError as e:
+        click.secho(f"Could not read the part number list! {e}", bold=True, fg="red")
+        return []
+
+    print(f"Loaded {len(part_numbers)} part numbers.")
+    return part_numbers
@@ -7,9 +7,29 @@ from pylibdmtx import pylibdmtx
 from enum import Enum, auto
 from inventree.part import PartCategory, Part
 from pyzbar import pyzbar
+from pyzbar.pyzbar import ZBarSymbol
 from anytree import Node, RenderTree, search
 from difflib import get_close_matches
 
+class Symbology(Enum):
+    DATAMATRIX = auto()     # ECC 200 Data Matrix, decoded by pylibdmtx
+    QR = auto()             # QR code, decoded by pyzbar
+    BARCODE = auto()        # Linear (1D) barcodes, decoded by pyzbar
+
+# pyzbar symbols that make up Symbology.BARCODE
+LINEAR_ZBAR_SYMBOLS = [
+    ZBarSymbol.EAN8, ZBarSymbol.EAN13, ZBarSymbol.UPCA, ZBarSymbol.UPCE,
+    ZBarSymbol.I25, ZBarSymbol.DATABAR, ZBarSymbol.DATABAR_EXP, ZBarSymbol.CODABAR,
+    ZBarSymbol.CODE39, ZBarSymbol.CODE93, ZBarSymbol.CODE128
+]
+
+# Candidate region detection (see Tools.find_code_regions)
+REGION_DETECT_WIDTH = 640   # Width of the downscaled frame used for detection
+REGION_MIN_SIZE = 24        # Smallest side of a candidate region on the downscaled frame
+REGION_PADDING = 0.15       # Padding added around a region, relative to its size
+MAX_REGIONS = 6             # Maximum number of regions decoded per frame
+DMTX_TIMEOUT = 10           # Milliseconds pylibdmtx may search an image, keeps live scanning responsive
+
 class Tools():
     def __init__(self):
         self.CLEANR = re.compile('<.*?>')
@@ -238,37 +258,129 @@ class Tools():
         # If no match is found, return None
         return None
 
-    def read_barcodes(self, frame):
+    def find_code_regions(self, gray) -> list[tuple[int, int, int, int]]:
+        """
+        Find areas of a grayscale frame that may contain a barcode. Detection runs
+        on a downscaled copy, dense high-gradient blobs (code modules) are kept.
+
+        :param gray: Grayscale image (numpy array)
+        :return: List of (x, y, w, h) rectangles in full resolution coordinates
+        """
+        height, width = gray.shape[:2]
+        scale = min(1.0, REGION_DETECT_WIDTH / width)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+        # Gradient magnitude highlights the dense black/white edges of code modules
+        grad_x = cv2.convertScaleAbs(cv2.Sobel(small, cv2.CV_16S, 1, 0, ksize=3))
+        grad_y = cv2.convertScaleAbs(cv2.Sobel(small, cv2.CV_16S, 0, 1, ksize=3))
+        gradient = cv2.blur(cv2.addWeighted(grad_x, 0.5, grad_y, 0.5, 0), (5, 5))
+        _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Join the modules into solid blobs and drop thin edges and text strokes
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9)))
+        mask = cv2.erode(mask, None, iterations=3)
+        mask = cv2.dilate(mask, None, iterations=3)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = REGION_MIN_SIZE * REGION_MIN_SIZE
+        candidates = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < min_area or max(w, h) > 4 * min(w, h):
+                continue
+            candidates.append((w * h, x, y, w, h))
+
+        regions = []
+        for _, x, y, w, h in sorted(candidates, reverse=True)[:MAX_REGIONS]:
+            # Scale back to full resolution and pad, so the code's quiet zone is kept
+            pad = int(max(w, h) * REGION_PADDING)
+            x0 = max(int((x - pad) / scale), 0)
+            y0 = max(int((y - pad) / scale), 0)
+            x1 = min(int((x + w + pad) / scale), width)
+            y1 = min(int((y + h + pad) / scale), height)
+            regions.append((x0, y0, x1 - x0, y1 - y0))
+        return regions
+
+    def decode_barcodes(self, frame, symbologies=None, use_regions=True, dmtx_timeout=DMTX_TIMEOUT) -> list[tuple[str, tuple[int, int, int, int]]]:
+        """
+        Scan an image frame for DataMatrix and standard barcodes/QR codes without drawing on it.
+        Unless use_regions is False, only areas found by find_code_regions are decoded.
+
+        :param frame: BGR or grayscale image (numpy array) from OpenCV
+        :param symbologies: Set of Symbology values to look for, all of them if None
+        :param use_regions: Decode candidate regions only instead of the whole frame
+        :param dmtx_timeout: Milliseconds the DataMatrix decoder may spend on each region
+        :return: List of (barcode_string, (x, y, w, h)) tuples, one per distinct payload
+        """
+        if symbologies is None:
+            symbologies = set(Symbology)
+
+        # Both decoders share one grayscale image that is never drawn on
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        if use_regions:
+            regions = self.find_code_regions(gray)
+        else:
+            regions = [(0, 0, gray.shape[1], gray.shape[0])]
+
+        # Decode each region at native resolution, keep the first location of every payload
+        decoded = {}
+        for rx, ry, rw, rh in regions:
+            for barcode_data, (x, y, w, h) in self.__decode_image(gray[ry:ry + rh, rx:rx + rw], symbologies, dmtx_timeout):
+                decoded.setdefault(barcode_data, (rx + x, ry + y, w, h))
+
+        return list(decoded.items())
+
+    def read_barcodes(self, frame, symbologies=None, use_regions=True, annotate=True):
         """
         Scan an image frame for both DataMatrix and standard barcodes/QR codes,
         draw bounding boxes and decoded text on the frame, and return all decoded values.
 
         :param frame: BGR image (numpy array) from OpenCV
+        :param symbologies: Set of Symbology values to look for, all of them if None
+        :param use_regions: Decode candidate regions only instead of the whole frame
+        :param annotate: Draw the bounding boxes and decoded text on the frame
         :return: Tuple of (annotated_frame, list_of_barcode_strings)
         """
         font = cv2.FONT_HERSHEY_DUPLEX
-        barcode_infos = []
+        barcodes = self.decode_barcodes(frame, symbologies, use_regions)
 
-        # Decode DataMatrix codes via pylibdmtx
-        dm_barcodes = pylibdmtx.decode(frame, timeout=10)
-        for dm_barcode in dm_barcodes:
-            barcode_data = dm_barcode.data.decode('utf-8')
-            barcode_infos.append(barcode_data)
-            x, y, w, h = dm_barcode.rect
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(frame, barcode_data, (x + 6, y - 6), font, 2.0, (255, 255, 255), 1)
-
-        # Decode barcodes & QR codes via pyzbar
-        standard_barcodes = pyzbar.decode(frame)
-        for barcode in standard_barcodes:
-            if barcode.type != 'DATAMATRIX':
-                barcode_data = barcode.data.decode('utf-8')
-                barcode_infos.append(barcode_data)
-                x, y, w, h = barcode.rect
+        # Annotate only after decoding so the decoders never see the drawings
+        if annotate:
+            for barcode_data, (x, y, w, h) in barcodes:
                 cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
                 cv2.putText(frame, barcode_data, (x + 6, y - 6), font, 2.0, (255, 255, 255), 1)
 
-        return frame, barcode_infos
+        return frame, [barcode_data for barcode_data, _ in barcodes]
+
+    def __decode_image(self, gray, symbologies, dmtx_timeout=DMTX_TIMEOUT) -> list[tuple[str, tuple[int, int, int, int]]]:
+        """Run the decoders for the given symbologies on a grayscale image."""
+        barcodes = []
+        height = gray.shape[0]
+
+        # Decode DataMatrix codes via pylibdmtx
+        if Symbology.DATAMATRIX in symbologies:
+            for dm_barcode in pylibdmtx.decode(gray, timeout=dmtx_timeout):
+                # libdmtx measures y from the bottom of the image
+                x, y, w, h = dm_barcode.rect
+                top = height - (y + h)
+                barcodes.append((dm_barcode.data.decode('utf-8'), (x, top, w, h)))
+
+        # Decode barcodes & QR codes via pyzbar, restricted to the requested symbols
+        if Symbology.QR in symbologies and Symbology.BARCODE in symbologies:
+            zbar_symbols = None
+        elif Symbology.QR in symbologies:
+            zbar_symbols = [ZBarSymbol.QRCODE]
+        elif Symbology.BARCODE in symbologies:
+            zbar_symbols = LINEAR_ZBAR_SYMBOLS
+        else:
+            return barcodes
+
+        for barcode in pyzbar.decode(gray, symbols=zbar_symbols):
+            if barcode.type != 'DATAMATRIX':
+                barcodes.append((barcode.data.decode('utf-8'), tuple(barcode.rect)))
+
+        return barcodes
     
 class DuplicateChoice(Enum):
     ADD_STOCK = auto()
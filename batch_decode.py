@@ -0,0 +1,137 @@
+"""
+Offline batch decoding of label photos and recorded videos.
+
+Every image in a directory (or every Nth frame of a video) is decoded on a
+process pool, the distinct payloads are parsed by the selected supplier and
+the deduplicated supplier part numbers are written to a file, one per line.
+quickinventory.py can load that file instead of scanning the parts live.
+"""
+import os
+import click
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.utilities import Tools
+from quickinventory import suppliers
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+VIDEO_CHUNK = 300   # Frames of a video decoded by one task
+DMTX_TIMEOUT = 1000 # Milliseconds a DataMatrix search may take, full resolution photos need far more than live frames
+
+# Per-process decoder state, set up by _init_worker
+_utils = None
+_symbologies = None
+_dmtx_timeout = None
+
+def _init_worker(symbologies, dmtx_timeout):
+    global _utils, _symbologies, _dmtx_timeout
+    _utils = Tools()
+    _symbologies = symbologies
+    _dmtx_timeout = dmtx_timeout
+
+def _decode_frame(frame) -> list[str]:
+    barcodes = _utils.decode_barcodes(frame, _symbologies, dmtx_timeout=_dmtx_timeout)
+    if not barcodes:
+        # Every image is only seen once, so fall back to the whole frame if no region matched
+        barcodes = _utils.decode_barcodes(frame, _symbologies, use_regions=False, dmtx_timeout=_dmtx_timeout)
+    return [barcode_data for barcode_data, _ in barcodes]
+
+def _decode_image(path: str) -> list[str]:
+    frame = cv2.imread(path)
+    if frame is None:
+        return []
+    return _decode_frame(frame)
+
+def _decode_video_chunk(task: tuple[str, int, int, int]) -> list[str]:
+    path, start, stop, step = task
+    video = cv2.VideoCapture(path)
+    video.set(cv2.CAP_PROP_POS_FRAMES, start)
+    payloads = []
+    for index in range(start, stop):
+        # grab() skips frames without the cost of decoding them to an image
+        if (index - start) % step != 0:
+            if not video.grab():
+                break
+            continue
+        ret, frame = video.read()
+        if not ret:
+            break
+        payloads.extend(_decode_frame(frame))
+    video.release()
+    return payloads
+
+def list_images(directory: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def video_tasks(path: str, step: int) -> list[tuple[str, int, int, int]]:
+    video = cv2.VideoCapture(path)
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    video.release()
+    return [(path, start, min(start + VIDEO_CHUNK, frame_count), step) for start in range(0, frame_count, VIDEO_CHUNK)]
+
+@click.command()
+@click.argument("source", type=click.Path(exists=True))
+@click.option("--supplier", "supplier_name", type=click.Choice(list(suppliers.keys()), case_sensitive=False), required=True,
+              help="Supplier whose labels are decoded")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default="part_numbers.txt", show_default=True,
+              help="File the supplier part numbers are written to")
+@click.option("--workers", "-j", type=click.IntRange(min=1), default=os.cpu_count(), show_default=True,
+              help="Number of decoding processes")
+@click.option("--frame-step", type=click.IntRange(min=1), default=5, show_default=True,
+              help="Decode every Nth frame of a video")
+@click.option("--dmtx-timeout", type=click.IntRange(min=1), default=DMTX_TIMEOUT, show_default=True,
+              help="Milliseconds the DataMatrix decoder may spend on each image region")
+@click.option("--config", default="config.toml", show_default=True, help="Configuration file with supplier credentials")
+def batch_decode(source, supplier_name, output, workers, frame_step, dmtx_timeout, config):
+    """Decode all labels in SOURCE, a directory of images or a video file."""
+    supplier_cls = suppliers[supplier_name]
+
+    if os.path.isdir(source):
+        func, tasks = _decode_image, list_images(source)
+        unit = "images"
+    else:
+        func, tasks = _decode_video_chunk, video_tasks(source, frame_step)
+        unit = "video chunks"
+
+    if not tasks:
+        click.secho(f"Nothing to decode in {source}!", bold=True, fg="red")
+        return
+
+    # Decoding is CPU bound, spread it over processes and keep only distinct payloads
+    payloads = []
+    seen = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(supplier_cls.symbologies, dmtx_timeout)) as pool:
+        results = pool.map(func, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+        with click.progressbar(results, length=len(tasks), label=f"Decoding {len(tasks)} {unit}") as bar:
+            for found in bar:
+                for payload in found:
+                    if payload not in seen:
+                        seen.add(payload)
+                        payloads.append(payload)
+
+    click.echo(f"Found {len(payloads)} distinct codes, parsing them...")
+
+    # parseCode may need the network, so every distinct payload is parsed once in this process
+    supplier = supplier_cls(Tools(), config)
+    part_numbers = []
+    for payload in payloads:
+        code = supplier.parseCode(payload)
+        if code is None:
+            continue
+        # A DigiKey label parses to its whole payload, the supplier part number is in its label data.
+        # Bags of the same part differ in quantity and lot, so they're deduplicated by it as well
+        label = supplier.labelData(code)
+        part_number = label.supplier_pn if label is not None and label.supplier_pn else code
+        if part_number not in part_numbers:
+            part_numbers.append(part_number)
+
+    with open(output, "w") as f:
+        f.writelines(f"{code}\n" for code in part_numbers)
+
+    click.secho(f"Wrote {len(part_numbers)} part numbers to {output}", fg="green")
+
+if __name__ == "__main__":
+    batch_decode()
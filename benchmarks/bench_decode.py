@@ -0,0 +1,212 @@
+"""
+Barcode decoding benchmark with synthetic supplier labels.
+
+Generates LCSC and TME QR codes and DigiKey ECC 200 DataMatrix codes with
+realistic payloads, renders them onto camera sized frames at varying size,
+rotation, blur and noise, and times Tools.read_barcodes and the individual
+decoder variants on the same frames.
+
+Run from the repository root:
+    python -m benchmarks.bench_decode --count 60
+"""
+import random
+import string
+import time
+from dataclasses import dataclass
+
+import click
+import cv2
+import numpy as np
+from pylibdmtx import pylibdmtx
+from pyzbar import pyzbar
+
+from backend.scanner import FrameDecoder
+from backend.utilities import Symbology, Tools
+
+KINDS = ("LCSC", "TME", "DigiKey")
+
+@dataclass
+class Sample:
+    kind: str               # Supplier the label imitates
+    payload: str            # Expected decoded string
+    frame: np.ndarray       # BGR frame containing the code
+    size: int               # Side of the rendered code in pixels
+    angle: float            # Rotation in degrees
+    blur: int               # Gaussian blur kernel size, 0 for none
+    noise: float            # Standard deviation of the added gaussian noise
+
+def _random_str(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+def lcsc_payload(rng: random.Random) -> str:
+    part = f"C{rng.randint(1, 9999999)}"
+    order = _random_str(rng, string.digits, 10)
+    return (f"{{pbn:PICK{order},on:SO{order},pc:{part},pm:{_random_str(rng, string.ascii_uppercase + string.digits, 10)},"
+            f"qty:{rng.choice([10, 50, 100, 1000])},mc:,cc:1,pdi:{rng.randint(10**7, 10**8)},hp:0,wc:ZH}}")
+
+def tme_payload(rng: random.Random) -> str:
+    mpn = _random_str(rng, string.ascii_uppercase + string.digits, 8)
+    return f"QTY:{rng.choice([5, 10, 25, 100])} PN:{mpn}-{rng.choice(['DIO', 'SMD', 'CAP'])} MFR:{_random_str(rng, string.ascii_uppercase, 6)} MPN:{mpn}"
+
+def digikey_payload(rng: random.Random) -> str:
+    # ECC 200 label (EIGP 114.2018), fields separated by GS (0x1D)
+    mpn = _random_str(rng, string.ascii_uppercase + string.digits, 10)
+    fields = [
+        "[)>\x1e06",
+        f"P{_random_str(rng, string.digits, 6)}",
+        f"1P{mpn}",
+        f"30P{mpn}-ND",
+        f"K{_random_str(rng, string.digits, 8)}",
+        f"1K{_random_str(rng, string.digits, 8)}",
+        f"10K{_random_str(rng, string.digits, 9)}",
+        f"9D{rng.randint(2000, 2552)}",
+        f"1T{_random_str(rng, string.ascii_uppercase + string.digits, 8)}",
+        "11K1",
+        "4LCN",
+        f"Q{rng.choice([10, 25, 100, 2500])}",
+        "11ZPICK",
+        f"12Z{_random_str(rng, string.digits, 7)}",
+        f"13Z{_random_str(rng, string.digits, 6)}",
+        f"20Z{'0' * 20}",
+    ]
+    return "\x1d".join(fields) + "\x1e\x04"
+
+PAYLOADS = {"LCSC": lcsc_payload, "TME": tme_payload, "DigiKey": digikey_payload}
+SYMBOLOGIES = {"LCSC": Symbology.QR, "TME": Symbology.QR, "DigiKey": Symbology.DATAMATRIX}
+
+def render_code(payload: str, symbology: Symbology) -> np.ndarray:
+    """Render the payload as a grayscale code image (one pixel per module, with quiet zone)."""
+    if symbology == Symbology.QR:
+        return cv2.QRCodeEncoder.create().encode(payload)
+
+    encoded = pylibdmtx.encode(payload.encode("utf-8"))
+    image = np.frombuffer(encoded.pixels, dtype=np.uint8).reshape(encoded.height, encoded.width, encoded.bpp // 8)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+def make_sample(rng: random.Random, kind: str, frame_size: tuple[int, int]) -> Sample:
+    width, height = frame_size
+    payload = PAYLOADS[kind](rng)
+    size = rng.choice([120, 180, 260, 400])
+    angle = rng.choice([0, 0, 10, 30, 45])
+    blur = rng.choice([0, 0, 3, 5])
+    noise = rng.choice([0, 5, 12])
+
+    code = cv2.resize(render_code(payload, SYMBOLOGIES[kind]), (size, size), interpolation=cv2.INTER_NEAREST)
+
+    # Place the code on a white label, on a mid gray background, then rotate the label
+    margin = size // 3
+    label = np.full((size + 2 * margin, int(size * 2.2) + 2 * margin), 255, np.uint8)
+    label[margin:margin + size, margin:margin + size] = code
+    cv2.putText(label, payload[:18], (2 * margin + size, margin + size // 2), cv2.FONT_HERSHEY_SIMPLEX, size / 300, 0, 2)
+
+    frame = np.full((height, width), 110, np.uint8)
+    x = rng.randint(0, width - label.shape[1])
+    y = rng.randint(0, height - label.shape[0])
+    frame[y:y + label.shape[0], x:x + label.shape[1]] = label
+
+    rotation = cv2.getRotationMatrix2D((x + label.shape[1] / 2, y + label.shape[0] / 2), angle, 1.0)
+    frame = cv2.warpAffine(frame, rotation, (width, height), borderValue=110)
+
+    if blur:
+        frame = cv2.GaussianBlur(frame, (blur, blur), 0)
+    if noise:
+        frame = np.clip(frame + np.random.default_rng(rng.randint(0, 2**32)).normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+
+    return Sample(kind, payload, cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR), size, angle, blur, noise)
+
+def decoder_variants(utils: Tools) -> dict:
+    """Decoder variants under test, each a callable (frame, kind) -> list of decoded strings."""
+    def zbar_only(frame, kind):
+        return [barcode.data.decode("utf-8") for barcode in pyzbar.decode(frame)]
+
+    def dmtx_only(frame, kind):
+        return [barcode.data.decode("utf-8") for barcode in pylibdmtx.decode(frame, timeout=10)]
+
+    def full_frame(frame, kind):
+        return utils.read_barcodes(frame, use_regions=False, annotate=False)[1]
+
+    def regions(frame, kind):
+        return utils.read_barcodes(frame, annotate=False)[1]
+
+    def supplier_regions(frame, kind):
+        return [code for code, _ in utils.decode_barcodes(frame, {SYMBOLOGIES[kind]})]
+
+    scanners = {kind: FrameDecoder(utils, {SYMBOLOGIES[kind]}) for kind in KINDS}
+    def scanner(frame, kind):
+        return [code for code, _ in scanners[kind](frame)]
+
+    return {
+        "pyzbar": zbar_only,
+        "pylibdmtx": dmtx_only,
+        "read_barcodes/full": full_frame,
+        "read_barcodes/regions": regions,
+        "supplier/regions": supplier_regions,
+        "FrameDecoder": scanner,
+    }
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+def run_variant(decode, samples: list[Sample], repeat: int) -> dict:
+    latencies = []
+    decoded = correct = wrong = 0
+    for sample in samples:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = decode(sample.frame.copy(), sample.kind)
+            latencies.append(time.perf_counter() - start)
+
+        if results:
+            decoded += 1
+        if sample.payload in results:
+            correct += 1
+        wrong += sum(1 for result in results if result != sample.payload)
+
+    total = sum(latencies)
+    return {
+        "fps": len(latencies) / total if total else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p90": percentile(latencies, 90) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "decoded": decoded / len(samples),
+        "accuracy": correct / len(samples),
+        "wrong": wrong,
+    }
+
+def print_table(title: str, rows: dict):
+    click.secho(f"\n{title}", bold=True)
+    click.echo(f"{'Variant':<24}{'fps':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'decoded':>9}{'correct':>9}{'wrong':>7}")
+    click.echo("-" * 84)
+    for name, r in rows.items():
+        click.echo(f"{name:<24}{r['fps']:>8.1f}{r['p50']:>9.1f}{r['p90']:>9.1f}{r['p99']:>9.1f}"
+                   f"{r['decoded']:>9.0%}{r['accuracy']:>9.0%}{r['wrong']:>7}")
+
+@click.command()
+@click.option("--count", type=click.IntRange(min=1), default=30, show_default=True, help="Synthetic labels per supplier")
+@click.option("--repeat", type=click.IntRange(min=1), default=1, show_default=True, help="Timed decodes per frame")
+@click.option("--resolution", type=click.Choice(["720p", "1080p", "4k"]), default="1080p", show_default=True)
+@click.option("--variant", "selected", multiple=True, help="Only run the given decoder variant (repeatable)")
+@click.option("--seed", type=int, default=1, show_default=True)
+def bench_decode(count, repeat, resolution, selected, seed):
+    """Time all decoder variants on synthetic LCSC, TME and DigiKey labels."""
+    frame_size = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}[resolution]
+    rng = random.Random(seed)
+
+    click.echo(f"Rendering {count * len(KINDS)} synthetic labels at {resolution}...")
+    samples = {kind: [make_sample(rng, kind, frame_size) for _ in range(count)] for kind in KINDS}
+
+    utils = Tools()
+    variants = decoder_variants(utils)
+    if selected:
+        variants = {name: decode for name, decode in variants.items() if name in selected}
+
+    for kind in KINDS:
+        rows = {name: run_variant(decode, samples[kind], repeat) for name, decode in variants.items()}
+        print_table(f"{kind} ({SYMBOLOGIES[kind].name}, {count} frames at {resolution})", rows)
+
+if __name__ == "__main__":
+    bench_decode()
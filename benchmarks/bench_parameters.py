@@ -0,0 +1,102 @@
+"""
+Parameter mapping benchmark.
+
+Builds large synthetic DigiKey, TME and LCSC parameter lists (mostly
+parameters nobody maps, plus every mapped one) and times the supplier
+ParameterMaps against the per-call id_map with nested loops the suppliers
+used before. Both must produce the same parameters.
+
+Run from the repository root:
+    python -m benchmarks.bench_parameters --size 500
+"""
+import random
+import time
+
+import click
+
+from backend.base import VALID_PART_PARAMETERS, Parameter
+from backend.parameter_map import normalize_name
+from backend.suppliers.digikey import PARAMETER_MAP as DIGIKEY_MAP
+from backend.suppliers.lcsc import PARAMETER_MAP as LCSC_MAP
+from backend.suppliers.tme import PARAMETER_MAP as TME_MAP
+
+MAPS = {"DigiKey": DIGIKEY_MAP, "TME": TME_MAP, "LCSC": LCSC_MAP}
+
+# A value that parses for every part parameter
+VALUES = {
+    "ohm": "10kΩ", "W": "0.1W", "F": "100nF", "H": "10uH", "V": "50V", "A": "1A", "%": "±1%", None: "0603",
+}
+
+def legacy_map(parameter_map, supplier_params, make=Parameter) -> list[Parameter]:
+    """
+    The mapping as it was: build an id_map and a param_map on every call, then
+    nested loops. make creates the result of a matched parameter.
+    """
+    id_map = {name: list(ids) for name, ids in parameter_map.table}
+
+    if parameter_map.by_name:
+        param_map = {normalize_name(p[parameter_map.key]): p for p in supplier_params}
+    else:
+        param_map = {p[parameter_map.key]: p for p in supplier_params}
+
+    params = []
+    for param_name, possible_ids in id_map.items():
+        for supplier_id in possible_ids:
+            if (param_dict := param_map.get(supplier_id)):
+                value = param_dict[parameter_map.value].strip()
+                if value != "" and value != "-":
+                    params.append(make(name=param_name, value_str=value))
+                    break
+    return params
+
+def make_params(rng: random.Random, parameter_map, size: int) -> list[dict]:
+    """size filler parameters plus the least preferred ID of every mapped parameter, shuffled."""
+    params = []
+    for i in range(size):
+        supplier_id = f"Unmapped parameter {i}" if parameter_map.by_name else 100000 + i
+        params.append({parameter_map.key: supplier_id, parameter_map.value: f"{rng.randint(1, 999)} units"})
+
+    for name, ids in parameter_map.table:
+        params.append({parameter_map.key: ids[-1], parameter_map.value: VALUES[VALID_PART_PARAMETERS[name]]})
+
+    rng.shuffle(params)
+    return params
+
+def lookup_only(name: str, value_str: str) -> tuple[str, str]:
+    return name, value_str
+
+def time_calls(map_params, responses: list[list[dict]], repeat: int) -> tuple[float, list]:
+    """Seconds per response of the fastest of repeat rounds, and the results."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [map_params(params) for params in responses]
+        best = min(best, time.perf_counter() - start)
+    return best / len(responses), results
+
+@click.command()
+@click.option("--size", type=click.IntRange(min=0), default=500, show_default=True, help="Unmapped parameters per response")
+@click.option("--responses", type=click.IntRange(min=1), default=50, show_default=True, help="Responses mapped per round")
+@click.option("--repeat", type=click.IntRange(min=1), default=7, show_default=True, help="Rounds, the fastest one is reported")
+@click.option("--seed", type=int, default=1, show_default=True)
+def bench_parameters(size, responses, repeat, seed):
+    """Time parameter mapping of large supplier responses."""
+    rng = random.Random(seed)
+
+    click.echo("Microseconds per response, with and without parsing the parameter values")
+    click.echo(f"{'Supplier':<10}{'legacy':>10}{'mapped':>10}{'speedup':>9}{'lookup legacy':>15}{'lookup mapped':>15}{'speedup':>9}")
+    click.echo("-" * 78)
+    for supplier, parameter_map in MAPS.items():
+        data = [make_params(rng, parameter_map, size) for _ in range(responses)]
+        legacy, expected = time_calls(lambda params: legacy_map(parameter_map, params), data, repeat)
+        mapped, results = time_calls(parameter_map.map, data, repeat)
+        legacy_lookup, _ = time_calls(lambda params: legacy_map(parameter_map, params, lookup_only), data, repeat)
+        mapped_lookup, _ = time_calls(parameter_map.resolve, data, repeat)
+
+        if results != expected:
+            click.secho(f"{supplier}: mapped parameters differ from the legacy mapping!", fg="red")
+        click.echo(f"{supplier:<10}{legacy * 1e6:>10.1f}{mapped * 1e6:>10.1f}{legacy / mapped:>8.2f}x"
+                   f"{legacy_lookup * 1e6:>15.1f}{mapped_lookup * 1e6:>15.1f}{legacy_lookup / mapped_lookup:>8.2f}x")
+
+if __name__ == "__main__":
+    bench_parameters()
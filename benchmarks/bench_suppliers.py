@@ -0,0 +1,76 @@
+"""
+Supplier lookup benchmark.
+
+Times supplier.query for the given part numbers: the first (cold) lookup,
+warm lookups reusing the supplier's pooled keep-alive session, lookups
+that open a new session every time like the module level requests calls
+used to do, and all lookups in flight at once through a LookupRunner.
+
+Run from the repository root:
+    python -m benchmarks.bench_suppliers --supplier TME 1N4007-DC BC547B-DIO
+"""
+import time
+
+import click
+
+from backend.lookups import LookupRunner
+from backend.suppliers.session import SupplierSession
+from backend.utilities import Tools
+from quickinventory import suppliers
+
+def timed_query(supplier, part_number: str) -> float:
+    start = time.perf_counter()
+    part_data = supplier.query(part_number)
+    elapsed = time.perf_counter() - start
+    if part_data is None:
+        click.secho(f"Lookup of {part_number} failed!", fg="red")
+    return elapsed
+
+def average(values: list[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+@click.command()
+@click.argument("part_numbers", nargs=-1, required=True)
+@click.option("--supplier", "supplier_name", type=click.Choice(list(suppliers.keys()), case_sensitive=False), required=True)
+@click.option("--rounds", type=click.IntRange(min=1), default=3, show_default=True, help="Lookups of every part number per mode")
+@click.option("--config", default="config.toml", show_default=True)
+def bench_suppliers(part_numbers, supplier_name, rounds, config):
+    """Compare cold, warm and no keep-alive lookups of PART_NUMBERS."""
+    supplier = suppliers[supplier_name](Tools(), config)
+
+    cold = timed_query(supplier, part_numbers[0])
+    warm = [timed_query(supplier, pn) for _ in range(rounds) for pn in part_numbers]
+
+    fresh = []
+    if isinstance(getattr(supplier, "session", None), SupplierSession):
+        for _ in range(rounds):
+            for pn in part_numbers:
+                # A new session per lookup means a new TCP and TLS handshake for every API call
+                supplier.session.close()
+                supplier.session = SupplierSession(limiter=supplier.session.limiter, fixtures=supplier.session.fixtures,
+                                                   replay=supplier.session.replay)
+                fresh.append(timed_query(supplier, pn))
+
+    # Every round at once, per part wall time
+    runner = LookupRunner(supplier)
+    start = time.perf_counter()
+    runner.run(list(part_numbers) * rounds)
+    concurrent = (time.perf_counter() - start) / (len(part_numbers) * rounds)
+    runner.close()
+
+    supplier.close()
+
+    click.secho(f"\n{supplier_name} lookups", bold=True)
+    click.echo(f"{'Cold (first lookup):':<30}{cold * 1000:>9.0f} ms")
+    click.echo(f"{'Warm (pooled session):':<30}{average(warm) * 1000:>9.0f} ms")
+    if fresh:
+        click.echo(f"{'New session per lookup:':<30}{average(fresh) * 1000:>9.0f} ms")
+        click.echo(f"{'Warm lookup speedup:':<30}{average(fresh) / average(warm):>9.2f}x")
+    click.echo(f"{'Concurrent, per lookup:':<30}{concurrent * 1000:>9.0f} ms")
+
+    limiter = getattr(getattr(supplier, "session", None), "limiter", None)
+    if limiter is not None and limiter.remaining is not None:
+        click.echo(f"{'Daily API quota left:':<30}{limiter.remaining:>9}")
+
+if __name__ == "__main__":
+    bench_suppliers()
@@ -0,0 +1,113 @@
+"""
+Local stub of the supplier APIs, serving responses recorded into fixture files.
+
+Record real responses once by setting mode = "record" in the [fixtures]
+config section and scanning or typing a few parts. Then start the stub
+server and point the [endpoints] config section at it (every supplier can
+use the same address), and supplier lookups work without network or
+credentials. Latency and errors can be added to measure supplier throughput
+and concurrency under realistic or bad conditions:
+    python -m benchmarks.stub_server --latency 300 --jitter 100 --error-rate 0.05
+    python -m benchmarks.bench_suppliers --supplier TME --config stub.toml 1N4007-DC BC547B-DIO
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+from backend.suppliers.replay import FIXTURE_DIR, FixtureStore, fixture_key
+
+TOKEN_PATH = "/oauth2/token"    # OAuth token requests aren't recorded, the stub hands out a dummy token
+STUB_TOKEN = {"access_token": "stub", "expires_in": 600, "token_type": "Bearer"}
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set on the handler class by make_server
+    fixtures: FixtureStore = None
+    latency = 0.0           # Seconds added to every response
+    jitter = 0.0            # Random latency spread in seconds, +-
+    error_rate = 0.0        # Share of requests answered with 500
+    throttle_rate = 0.0     # Share of requests answered with 429 and Retry-After
+    quiet = False
+
+    protocol_version = "HTTP/1.1"   # Keep-alive, like the real APIs
+
+    def do_GET(self):
+        self.__answer()
+
+    def do_POST(self):
+        self.__answer()
+
+    def __answer(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        key = fixture_key(self.command, self.path, body)
+
+        time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+
+        roll = random.random()
+        if roll < self.error_rate:
+            self.__send(500, "text/plain", "Stub server error")
+        elif roll < self.error_rate + self.throttle_rate:
+            self.__send(429, "text/plain", "Too many requests", {"Retry-After": "1"})
+        elif self.path.split("?")[0].endswith(TOKEN_PATH):
+            self.__send(200, "application/json", json.dumps(STUB_TOKEN))
+        elif (fixture := self.fixtures.load(key)) is None:
+            self.__send(404, "text/plain", f"No recorded response for {key}")
+        else:
+            self.__send(fixture["status"], fixture["content_type"], fixture["body"])
+
+    def __send(self, status: int, content_type: str, body: str, headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type or "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def make_server(fixtures: str = FIXTURE_DIR, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0,
+                jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0, quiet: bool = False) -> ThreadingHTTPServer:
+    """Create the stub server, latency and jitter in seconds. Run it with serve_forever()."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "fixtures": FixtureStore(fixtures), "latency": latency, "jitter": jitter,
+        "error_rate": error_rate, "throttle_rate": throttle_rate, "quiet": quiet,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_server(**kwargs) -> ThreadingHTTPServer:
+    """Run a stub server in a background thread, for use from benchmarks. Stop it with shutdown()."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-server").start()
+    return server
+
+@click.command()
+@click.option("--fixtures", default=FIXTURE_DIR, show_default=True, help="Directory of recorded responses")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", type=int, default=8765, show_default=True)
+@click.option("--latency", type=click.FloatRange(min=0), default=0, show_default=True, help="Milliseconds added to every response")
+@click.option("--jitter", type=click.FloatRange(min=0), default=0, show_default=True, help="Random latency spread in milliseconds")
+@click.option("--error-rate", type=click.FloatRange(0, 1), default=0, show_default=True, help="Share of requests failing with 500")
+@click.option("--throttle-rate", type=click.FloatRange(0, 1), default=0, show_default=True, help="Share of requests answered with 429")
+@click.option("--quiet", is_flag=True, help="Don't log requests")
+def stub_server(fixtures, host, port, latency, jitter, error_rate, throttle_rate, quiet):
+    """Serve recorded supplier responses on a local port."""
+    server = make_server(fixtures, host, port, latency / 1000, jitter / 1000, error_rate, throttle_rate, quiet)
+    click.echo(f"Serving {fixtures} on http://{host}:{port}, press CTRL+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    stub_server()
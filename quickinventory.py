@@ -2,10 +2,14 @@ import os
 import sys
 import traceback
 import click
+import copy
 import cv2
 import requests
 import signal
 import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 from getpass import getpass
 from backend.utilities import Tools
 from backend.file import fileHandler
@@ -13,21 +17,30 @@ from inventree.api import InvenTreeAPI
 from inventree.part import PartCategory, Part
 from inventree.stock import StockLocation
 from backend.base import PartData, baseSupplier
+from backend.cache import CachedSupplier, SupplierCache
+from backend.lookups import LookupRunner
+from backend.scanner import CameraSession, FrameDecoder, draw_overlay, enter_pressed, has_display
 from backend.utilities import DuplicateChoice as PartDupChoice
 
 from backend.suppliers.lcsc import LCSC
 from backend.suppliers.digikey import DigiKey
 from backend.suppliers.tme import TME
+from backend.suppliers.multi import MultiSupplier
 
 from backend.ui_utilities import *
 from backend.tree_utilities import *
 
 debug = True  # Set to True for debugging output
+DECODE_WORKERS = 2  # Number of threads decoding camera frames in parallel
+MOTION_GATE = True  # Skip decoding while the camera image doesn't change
+LABEL_FALLBACK_WAIT = 3  # Seconds to wait for the supplier before offering to continue with the label data
+FILL_IN_WAIT = 30  # Seconds to wait on exit for lookups that still have to fill in parts
 
 suppliers = {
     "LCSC": LCSC,           # QR code
     "DigiKey": DigiKey,     # Data Matrix ECC 200
-    "TME": TME              # QR code
+    "TME": TME,             # QR code
+    "Auto": MultiSupplier   # All configured suppliers, picked by the label
 }
 
 STOP_EVENT = threading.Event()
@@ -70,61 +83,212 @@ def initialize_inventree_api(config: str) -> 'InvenTreeAPI':
         api = InvenTreeAPI(server_url, token=token)
     return api
 
-def get_part_data(cam, utils: Tools, supplier: baseSupplier) -> PartData:
+def get_part_lookup(cam, utils: Tools, supplier: baseSupplier, pending: deque, lookups: LookupRunner, use_tray: bool = False) -> tuple[str, Future, PartData]:
+    """
+    Get the next part code to enter, with its supplier lookup already running
+    in the background and the partial part data read from its label (if any).
+    Resolve the lookup with get_part_data once it's needed.
+    """
+    from_queue = bool(pending)
     while True:
+        if pending:
+            # Part queued by a tray scan, its lookup may already be finished
+            code, lookup, label = pending.popleft()
+            if label is None and lookup is not None and lookup.done() and lookup.exception() is None and lookup.result() is None:
+                click.secho(f"No data found for {code}, skipping it.", fg="yellow")
+                continue
+            if pending or from_queue:
+                print(f"Next queued part: {code} ({len(pending)} more in queue)")
+            return code, lookup, label
+
         if cam == None:
-            code = click.prompt("Enter supplier part number")
+            codes = [click.prompt("Enter supplier part number")]
+        elif use_tray:
+            codes = run_tray_scanner(utils, supplier, cam)
         else:
             code = run_scanner(utils, supplier, cam)
+            codes = [code] if code is not None else None
 
-        if code is None:
+        if codes is None:
             raise(KeyboardInterrupt)
-        
-        print("Querying supplier...")
-        part_data = supplier.query(code)
 
-        if part_data is None:
+        # Nothing else is queued, so the first code comes straight back out
+        queue_lookups(pending, lookups, supplier, codes)
+
+def get_part_data(supplier: baseSupplier, code: str, lookup: Future, label: PartData) -> PartData:
+    """
+    Wait for the lookup started by get_part_lookup, None if the supplier has no
+    data for the code. If the supplier is slow or fails, the label data can be
+    used instead, a lookup that's still running fills in the part later.
+    """
+    print("Querying supplier...")
+    try:
+        try:
+            if lookup is None:
+                part_data = supplier.query(code)
+            else:
+                part_data = lookup.result(timeout=LABEL_FALLBACK_WAIT if label is not None else None)
+        except TimeoutError:
+            if click.confirm("The supplier is slow to answer, continue with the label data and fill in the rest later?", default=True):
+                return label
+            part_data = lookup.result()
+    except Exception as e:
+        # A failed lookup is handled like a part the supplier doesn't know
+        click.secho(f"Supplier lookup of {code} failed! {e}", fg="red")
+        part_data = None
+
+    if part_data is None:
+        if label is not None and click.confirm(f"No supplier data found for {code}, continue with the label data?", default=True):
+            return label
+        click.secho(f"No data found for {code}, skipping it.", fg="yellow")
+        return None
+
+    # The label knows how many parts are in the bag
+    if label is not None and label.part_count:
+        part_data.part_count = label.part_count
+
+    # Parsing in the background lookup couldn't ask, so ambiguous parameter values are picked here
+    part_data.choose_parameters()
+
+    print(f"Parsed {part_data.link}")
+    limiter = getattr(getattr(supplier, "session", None), "limiter", None)
+    if limiter is not None and limiter.remaining is not None and limiter.remaining < limiter.per_day // 10:
+        click.secho(f"Only {limiter.remaining} supplier API requests left today!", fg="yellow")
+    return part_data
+
+def fill_in_parts(api: InvenTreeAPI, unfinished: list, wait: float = 0):
+    """
+    Fill in parts that were created from label data as soon as their supplier
+    lookups finish. Waits up to wait seconds for lookups still running.
+    """
+    for entry in list(unfinished):
+        part_pk, part_data, label, lookup = entry
+        try:
+            supplier_data = lookup.result(timeout=wait)
+        except TimeoutError:
+            continue
+        except Exception:
+            supplier_data = None
+        unfinished.remove(entry)
+
+        if supplier_data is None:
+            click.secho(f"Supplier lookup of {part_data.supplier_pn} failed, part {part_pk} keeps the label data.", fg="yellow")
             continue
+        supplier_data.choose_parameters()
+        part_data.fill_in(api, part_pk, label, supplier_data)
+        click.secho(f"Filled in {part_data.name} (pk: {part_pk}) with the supplier data.", fg="green")
+
+def queue_lookups(pending: deque, lookups: LookupRunner, supplier: baseSupplier, codes: list[str]):
+    """Queue scanned codes and start their supplier lookups in the background right away."""
+    labels = [supplier.labelData(code) for code in codes]
+    if not supplier.thread_safe:
+        pending.extend(zip(codes, [None] * len(codes), labels))
+        return
 
-        print(f"Parsed {part_data.link}")
-        return part_data
+    # All lookups are in flight at once, as many as the supplier allows
+    pending.extend(zip(codes, lookups.submit_many(codes), labels))
 
-def run_scanner(utils: Tools, supplier: baseSupplier, adress: str) -> Part:
+def run_scanner(utils: Tools, supplier: baseSupplier, camera: CameraSession) -> Part:
     code = None
 
-    camera = cv2.VideoCapture(adress)
-    if not camera.isOpened():
-        click.secho("Could not open the camera!", bold=True, fg="red")
-        sys.exit(0)
+    # Capture and decoding run in the background, this loop only displays frames
+    pipeline = camera.pipeline
+    pipeline.resume()
 
-    print("Press ESC to exit the camera.")
-    while True:
-        ret, frame_raw = camera.read()
+    print("Press ENTER to stop scanning." if camera.headless else "Press ESC to exit the camera.")
+    try:
+        shown_id = 0
+        reported = set()
+        while True:
+            shown_id, key = update_preview(camera, shown_id)
+            if key == 27 or (camera.headless and key == 13):
+                break
 
-        if frame_raw is None:
-            click.secho("Camera connection error!", bold=True, fg="red")
-            sys.exit(0)
+            for results, captured_at in pipeline.poll():
+                for result in results:
+                    if camera.headless and result not in reported:
+                        reported.add(result)
+                        print(f"Detected: {result}")
 
-        frame, results = utils.read_barcodes(frame_raw.copy())
-        cv2.imshow('Barcode/QR code reader', frame)
-        
-        if cv2.waitKey(1) & 0xFF == 27:
-            break
+                    code = camera.payloads.parse(result, supplier.parseCode)
+                    if code != None:
+                        pipeline.record_latency(captured_at)
+                        break
 
-        if results == []:
-            continue
+                if code != None:
+                    break
 
-        for result in results:
-            code = supplier.parseCode(result)
             if code != None:
                 break
+    finally:
+        pipeline.pause()
+        if not camera.headless:
+            cv2.destroyAllWindows()
+
+    if debug:
+        print(pipeline.stats.summary())
+    return code
 
-        if code != None:
+def run_tray_scanner(utils: Tools, supplier: baseSupplier, camera: CameraSession) -> list[str]:
+    """
+    Collect every distinct valid code in view of the camera until the operator
+    finishes the tray with ENTER. Returns None if ESC was pressed before any code was found.
+    """
+    codes = []
+
+    pipeline = camera.pipeline
+    pipeline.resume()
+
+    if camera.headless:
+        print("Press ENTER when all labels were found.")
+    else:
+        print("Press ENTER when all labels were found, ESC to exit the camera.")
+    try:
+        shown_id = 0
+        reported = set()
+        while True:
+            shown_id, key = update_preview(camera, shown_id)
+            if key in (13, 10, 27):
                 break
 
-    cv2.destroyAllWindows()
-    camera.release()
-    return code
+            for results, captured_at in pipeline.poll():
+                for result in results:
+                    if camera.headless and result not in reported:
+                        reported.add(result)
+                        print(f"Detected: {result}")
+
+                    code = camera.payloads.parse(result, supplier.parseCode)
+                    if code != None and code not in codes:
+                        pipeline.record_latency(captured_at)
+                        codes.append(code)
+                        print(f"Found {code} ({len(codes)} total)")
+    finally:
+        pipeline.pause()
+        if not camera.headless:
+            cv2.destroyAllWindows()
+
+    if debug:
+        print(pipeline.stats.summary())
+
+    if key == 27 and not codes:
+        return None
+    return codes
+
+def update_preview(camera: CameraSession, shown_id: int) -> tuple[int, int]:
+    """
+    Show the newest camera frame with a minimal overlay of the latest detections
+    and return (shown_id, pressed_key). In headless mode no window is used,
+    ENTER pressed in the terminal is reported as key 13.
+    """
+    if camera.headless:
+        time.sleep(0.02)
+        return shown_id, 13 if enter_pressed() else -1
+
+    frame_id, _, frame = camera.grabber.latest()
+    if frame is not None and frame_id != shown_id:
+        cv2.imshow('Barcode/QR code reader', draw_overlay(frame, camera.pipeline.detections()))
+        shown_id = frame_id
+    return shown_id, cv2.waitKey(1) & 0xFF
 
 def main():
     print("Starting QuickInventory...")
@@ -140,14 +304,41 @@ def main():
     clear_screen()
 
     supplier = select_supplier(suppliers, utils, config)
+    supplier.use_parameters = use_parameters
+    # Repeat scans of the same parts are answered from the local cache
+    cache_bypass = fileHandler(config).readCredentials().get("cache", {}).get("bypass", False)
+    supplier = CachedSupplier(supplier, SupplierCache.from_config(config), bypass=cache_bypass)
     clear_screen()
 
-    cam = select_input_option(utils)
+    cam = None
+    use_tray = False
+    loaded_codes = []
+    address = select_input_option(utils)
+    if address is not None:
+        # Keep one camera connection open for all scans
+        decoder = FrameDecoder(utils, supplier.symbologies)
+        headless = not has_display()
+        if headless:
+            click.secho("No display found, scanning without a camera preview.", fg="yellow")
+        cam = CameraSession(address, decoder, workers=DECODE_WORKERS, motion_gate=MOTION_GATE, headless=headless)
+        if not cam.open():
+            click.secho("Could not open the camera!", bold=True, fg="red")
+            sys.exit(0)
+        use_tray = click.confirm("Would you like to use tray mode (scan many labels at once)?", default=False)
+    else:
+        loaded_codes = select_part_list()
     clear_screen()
 
+    # Parts found by a tray scan or loaded from a list, waiting to be entered, with their supplier lookups
+    pending = deque()
+    lookups = LookupRunner(supplier)
+    # Parts created from label data, waiting for their supplier lookups to fill them in
+    unfinished = []
+    if loaded_codes:
+        queue_lookups(pending, lookups, supplier, loaded_codes)
+
     try:
         while True:
-            # TODO: LCSC parameter mapping isn't implemented
             # TODO: add ability to type category and auto complete for it
             # TODO: find_part() could use Part.list(api, name_regex=) method
             # TODO: move to click library instead of While loops everywhere
@@ -162,19 +353,28 @@ def main():
             # If template is empty skip searching for it and assume the user doesn't want one
 
             clear_screen()
-            part_data = get_part_data(cam, utils, supplier)
+            fill_in_parts(api, unfinished)
+            # The supplier lookup runs in the background while the category and location are picked
+            code, lookup, label = get_part_lookup(cam, utils, supplier, pending, lookups, use_tray)
 
             part_categories = PartCategory.list(api)
             part_locations = StockLocation.list(api)
             part_list = Part.list(api)
 
             category_pk = select_from_tree(utils, category_tree_root, part_categories, tree_type="category")
-            part_data.category_pk = category_pk
             clear_screen()
             location_pk = select_from_tree(utils, location_tree_root, part_locations, tree_type="location")
-            part_data.location_pk = location_pk
             clear_screen()
 
+            part_data = get_part_data(supplier, code, lookup, label)
+            if part_data is None:
+                click.pause()
+                continue
+            # Created from the label, it's filled in once the lookup finishes (it may have while the user answered)
+            partial = copy.copy(label) if part_data is label and lookup is not None else None
+            part_data.category_pk = category_pk
+            part_data.location_pk = location_pk
+
             template_pk = None
 
             if use_parameters:
@@ -204,17 +404,20 @@ def main():
                 case PartDupChoice.CREATE_NEW:
                     print("Creating new part...")
             
-            part_data.part_count = handle_part_quantity()
+            part_data.part_count = handle_part_quantity(part_data.part_count or 1)
             part_data.minimum_stock = handle_minimal_stock()
             unit_price = handle_parts_price(part_data.part_count, part_data.unit_price)
-            if unit_price > 0.0:
+            # A zero total keeps the supplier's price, a part from label data has none to keep
+            if unit_price > 0.0 or part_data.unit_price is None:
                 part_data.unit_price = unit_price
 
             part_data.pretty_print(part_categories, part_locations)
             if click.confirm( "Would you like to change any of the values?", default=False):
                 part_data.interactive_edit(utils, category_tree_root, part_categories, category_tree_root, part_locations)
 
-            part_data.create(api, template_pk)
+            part_pk = part_data.create(api, template_pk)
+            if partial is not None:
+                unfinished.append((part_pk, part_data, partial, lookup))
 
             # Add more functionality as needed
     except (KeyboardInterrupt, click.Abort):
@@ -222,6 +425,18 @@ def main():
     except Exception:
         traceback.print_exc(file=sys.stdout)
     finally:
+        if unfinished:
+            print("Filling in parts created from label data...")
+            try:
+                fill_in_parts(api, unfinished, wait=FILL_IN_WAIT)
+            except (KeyboardInterrupt, click.Abort):
+                pass
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+        lookups.close()
+        if cam is not None:
+            cam.close()
+        supplier.close()
         return
 
 if __name__ == "__main__":